@@ -0,0 +1,188 @@
+"""Autotuning module
+
+Benchmarks a TFLite model over interpreter thread counts, XNNPACK on/off and
+batch sizes on synthetic input, and stores the fastest configuration per
+model digest and host CPU signature. predict.py applies the stored
+configuration when AUTOTUNE=1. If none exists yet, it serves the default
+settings and tunes in the background from startup, then swaps in the tuned pool.
+Tuning interpreters stay out of the service's metrics, and results measured
+while the service ran inferences are discarded rather than stored.
+To tune on demand:
+
+    python autotune.py --model data/model.tflite
+"""
+
+import argparse
+import json
+import os
+import platform
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import predict
+
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+
+
+def cpu_signature():
+    """Identifies the host CPU model and the number of usable cores"""
+    model_name = platform.processor() or platform.machine()
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    model_name = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f'{model_name} x{predict.available_cpus()}'
+
+
+def config_key(digest):
+    """Keys a stored configuration by model digest and host"""
+    return f'{digest}:{cpu_signature()}'
+
+
+def read_configs(path):
+    """Reads every stored configuration, or none if the file is missing"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_config(path, digest):
+    """Returns the stored configuration of a model on this host, if any"""
+    return read_configs(path).get(config_key(digest))
+
+
+def save_config(path, config):
+    """Stores a configuration next to the ones of other models and hosts"""
+    configs = read_configs(path)
+    configs[config_key(config['model_digest'])] = config
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(configs, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def thread_counts(cpus):
+    """Returns the powers of two up to the number of CPUs, plus that number"""
+    counts = {cpus}
+    count = 1
+    while count < cpus:
+        counts.add(count)
+        count *= 2
+    return sorted(counts)
+
+
+def measure(interpreters, batch_size, min_seconds):
+    """Returns images per second and batch latency with every interpreter busy"""
+    height, width, channels = interpreters[0].input_shape[1:]
+    rng = np.random.default_rng(0)
+    batch = list(rng.integers(0, 256, size=(batch_size, height, width, channels), dtype=np.uint8))
+    for model_interpreter in interpreters:
+        model_interpreter.invoke_images(batch)
+
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + min_seconds
+
+    def work(model_interpreter):
+        while True:
+            start = time.perf_counter()
+            model_interpreter.invoke_images(batch)
+            end = time.perf_counter()
+            with lock:
+                latencies.append(end - start)
+            if end >= deadline:
+                return
+
+    threads = [threading.Thread(target=work, args=(mi,)) for mi in interpreters]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'images_per_second': len(latencies) * batch_size / elapsed,
+        'p95_batch_ms': float(np.percentile(latencies, 95) * 1000),
+    }
+
+
+def tune(model_path, digest=None, batch_sizes=BATCH_SIZES, threads=None,
+         min_seconds=0.5, max_latency_ms=None, log=print):
+    """Benchmarks the settings grid and returns the fastest configuration
+
+    Each thread count runs as many concurrent interpreters as fit in the
+    usable CPUs, which is how predict.py sizes its pool. With max_latency_ms,
+    only settings whose p95 batch latency stays under it are eligible.
+    """
+    cpus = predict.available_cpus()
+    results = []
+    for num_threads in threads or thread_counts(cpus):
+        pool_size = max(1, cpus // num_threads)
+        for use_xnnpack in (True, False):
+            try:
+                interpreters = [
+                    predict.ModelInterpreter(model_path, num_threads, use_xnnpack, record_metrics=False)
+                    for _ in range(pool_size)
+                ]
+            except Exception as e:
+                log(f'Skipping threads={num_threads} xnnpack={use_xnnpack}: {e}')
+                continue
+            for batch_size in batch_sizes:
+                result = {
+                    'num_threads': num_threads,
+                    'pool_size': pool_size,
+                    'use_xnnpack': use_xnnpack,
+                    'batch_size': batch_size,
+                    **measure(interpreters, batch_size, min_seconds),
+                }
+                results.append(result)
+                log(f'threads={num_threads:<3} pool={pool_size:<3} xnnpack={use_xnnpack!s:5} '
+                    f'batch={batch_size:<3} {result["images_per_second"]:8.1f} images/s  '
+                    f'p95 {result["p95_batch_ms"]:8.2f} ms')
+
+    eligible = [
+        r for r in results if max_latency_ms is None or r['p95_batch_ms'] <= max_latency_ms
+    ]
+    best = max(eligible or results, key=lambda r: r['images_per_second'])
+    return {
+        **best,
+        'model_path': model_path,
+        'model_digest': digest or predict.file_digest(model_path),
+        'cpu_signature': cpu_signature(),
+        'tuned_at': datetime.now().isoformat(timespec='seconds'),
+        'grid': results,
+    }
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=predict.MODEL_PATH, help='TFLite model to tune')
+    parser.add_argument('--output', default=predict.AUTOTUNE_PATH,
+                        help='JSON file the configuration is stored in')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(BATCH_SIZES))
+    parser.add_argument('--threads', type=int, nargs='+', help='Thread counts to try')
+    parser.add_argument('--seconds', type=float, default=0.5, help='Measurement time per setting')
+    parser.add_argument('--max-latency-ms', type=float, help='Upper bound on p95 batch latency')
+    args = parser.parse_args()
+
+    config = tune(args.model, batch_sizes=args.batch_sizes, threads=args.threads,
+                  min_seconds=args.seconds, max_latency_ms=args.max_latency_ms)
+    save_config(args.output, config)
+    print(f'Best: threads={config["num_threads"]} pool={config["pool_size"]} '
+          f'xnnpack={config["use_xnnpack"]} batch={config["batch_size"]} '
+          f'({config["images_per_second"]:.1f} images/s), saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Benchmark module
+
+Load-tests predict.py fully offline: a tiny TFLite model with the served
+input shape is generated with TensorFlow, synthetic CT-like slices are
+encoded in several sizes and formats, and each combination is driven
+in-process through predict() and through the Flask /predict route at the
+requested concurrency levels. Throughput and latency percentiles are
+reported as JSON:
+
+    python benchmark.py --requests 100 --concurrency 1 4 8 --output bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+
+SIZES = (224, 512, 1024)
+FORMATS = ('PNG', 'JPEG')
+MODES = ('inprocess', 'flask')
+
+
+def build_tiny_model(path):
+    """Writes a small sigmoid classifier with the served input shape to path"""
+    import tensorflow as tf
+
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(224, 224, 3)),
+        tf.keras.layers.Conv2D(4, 3, strides=4, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(1, activation='sigmoid'),
+    ])
+    tflite_model = tf.lite.TFLiteConverter.from_keras_model(model).convert()
+    with open(path, 'wb') as f:
+        f.write(tflite_model)
+    return path
+
+
+def synthetic_ct_image(size, seed):
+    """Creates a grayscale axial CT-like slice: skull ring, brain and noise"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[:size, :size] / size - 0.5
+    radius = np.hypot(xx / 0.42, yy / 0.48)
+    img = np.zeros((size, size), dtype='float32')
+    img[radius < 1.0] = 230
+    img[radius < 0.92] = 90 + rng.normal(0, 12, size=(radius < 0.92).sum())
+    lesion = np.hypot(xx - rng.uniform(-0.15, 0.15), yy - rng.uniform(-0.15, 0.15))
+    img[lesion < rng.uniform(0.02, 0.08)] = 60
+    return Image.fromarray(np.clip(img, 0, 255).astype('uint8'), mode='L')
+
+
+def encode(img, fmt):
+    """Encodes an image into the bytes a client would upload"""
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def generate_payloads(size, fmt, count):
+    """Generates distinct encoded slices so the prediction cache never hits"""
+    return [encode(synthetic_ct_image(size, seed), fmt) for seed in range(count)]
+
+
+def latency_summary(latencies, elapsed):
+    """Summarizes per-request latencies in milliseconds"""
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        'requests': len(latencies),
+        'throughput_rps': len(latencies) / elapsed,
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(latencies_ms.max()),
+    }
+
+
+def run_load(call, payloads, requests, concurrency, warmup=3):
+    """Sends requests payloads through call with the given concurrency"""
+    for data in payloads[:warmup]:
+        call(data)
+
+    def timed(i):
+        start = time.perf_counter()
+        call(payloads[i % len(payloads)])
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, range(requests)))
+    return latency_summary(latencies, time.perf_counter() - start)
+
+
+def inprocess_caller(predict):
+    """Calls predict() directly, the way app.py does"""
+
+    def call(data):
+        predict.predict(io.BytesIO(data))
+
+    return call
+
+
+def flask_caller(predict, fmt):
+    """Posts to the /predict route through one Flask test client per thread"""
+    local = threading.local()
+    filename = f'scan.{fmt.lower()}'
+
+    def call(data):
+        if not hasattr(local, 'client'):
+            local.client = predict.app.test_client()
+        response = local.client.post(
+            predict.PREDICT_URL,
+            data={'img': (io.BytesIO(data), filename)},
+            content_type='multipart/form-data',
+        )
+        body = response.get_json()
+        if response.status_code != 200 or 'Error' in body:
+            raise RuntimeError(f'Prediction failed: {body}')
+
+    return call
+
+
+def parse_args():
+    """Parses the command line"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', help='TFLite model to serve (default: generated tiny model)')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per run')
+    parser.add_argument('--images', type=int, default=16, help='Distinct images per size/format')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--cache', action='store_true', help='Keep the prediction cache enabled')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    return parser.parse_args()
+
+
+def main():
+    """Command line entry point"""
+    args = parse_args()
+    results = []
+    with tempfile.TemporaryDirectory(prefix='stroke-bench-') as workdir:
+        # The converter and the endpoint log to stdout, which is reserved for the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            model_path = args.model or build_tiny_model(os.path.join(workdir, 'tiny.tflite'))
+
+            # predict.py reads its configuration at import time
+            os.environ['MODEL_PATH'] = model_path
+            if not args.cache:
+                os.environ['PREDICTION_CACHE_SIZE'] = '0'
+            import predict
+
+            for size in args.sizes:
+                for fmt in args.formats:
+                    payloads = generate_payloads(size, fmt, args.images)
+                    for mode in args.modes:
+                        if mode == 'inprocess':
+                            call = inprocess_caller(predict)
+                        else:
+                            call = flask_caller(predict, fmt)
+                        for concurrency in args.concurrency:
+                            summary = run_load(call, payloads, args.requests, concurrency)
+                            results.append({
+                                'mode': mode,
+                                'size': size,
+                                'format': fmt,
+                                'concurrency': concurrency,
+                                **summary,
+                            })
+                            print(f'{mode:9} {size:5}px {fmt:4} c={concurrency:<3} '
+                                  f'{summary["throughput_rps"]:8.1f} req/s  '
+                                  f'p50 {summary["p50_ms"]:7.2f} ms  p99 {summary["p99_ms"]:7.2f} ms',
+                                  file=sys.stderr)
+
+        report = {
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': predict.available_cpus(),
+                'model_path': model_path,
+                'model_digest': predict.get_pool().digest,
+                'interpreter_pool_size': predict.get_pool().size,
+                'interpreter_num_threads': predict.get_pool().num_threads,
+                'micro_batch_window_ms': predict.MICRO_BATCH_WINDOW_MS,
+                'prediction_cache_size': predict.cache.max_size,
+            },
+            'results': results,
+        }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""Bulk scoring module
+
+Re-scores an archive of scans offline with predict.py's preprocessing and
+interpreter:
+
+    python bulk_score.py brain_ct_archive/ scores.csv
+    python bulk_score.py brain_ct_archive/ scores_parquet/ --format parquet
+
+Images are decoded and resized by a process pool. A bounded number of
+decoded images is prefetched ahead of the batched invokes, so memory stays
+flat whatever the archive size. Results are appended after every batch and
+act as the checkpoint: re-running the same command skips the scans already
+scored with the same model.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+import predict
+
+
+IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg')
+FIELDS = ('path', 'probability', 'stroke', 'model_version', 'model_digest', 'error')
+
+
+def find_images(root):
+    """Lists the images under root in a stable order"""
+    if os.path.isfile(root):
+        with open(root) as f:
+            return [line.strip() for line in f if line.strip()]
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(root, '**', pattern), recursive=True))
+    return sorted(paths)
+
+
+def decode(path):
+    """Decodes and resizes one scan in a worker process"""
+    try:
+        return path, np.asarray(predict.load_image(path)), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+class CsvWriter:
+    """Appends result rows to a CSV file that doubles as the checkpoint"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def done(self, digest):
+        """Returns the paths already scored with the model digest"""
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, newline='') as f:
+            return {row['path'] for row in csv.DictReader(f) if row['model_digest'] == digest}
+
+    def write(self, rows):
+        """Appends rows and flushes them to disk"""
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def close(self):
+        """Nothing is buffered between batches"""
+
+
+class ParquetWriter:
+    """Writes result rows as numbered part files in a directory"""
+
+    def __init__(self, path, rows_per_part=10000):
+        self.path = path
+        self.rows_per_part = rows_per_part
+        self.pending = []
+        os.makedirs(path, exist_ok=True)
+
+    def parts(self):
+        """Lists the part files already written"""
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def done(self, digest):
+        """Returns the paths already scored with the model digest"""
+        import pandas as pd
+
+        done = set()
+        for part in self.parts():
+            df = pd.read_parquet(part, columns=['path', 'model_digest'])
+            done.update(df.loc[df['model_digest'] == digest, 'path'])
+        return done
+
+    def write(self, rows):
+        """Buffers rows and writes a part file once enough have accumulated"""
+        self.pending.extend(rows)
+        if len(self.pending) >= self.rows_per_part:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows as the next part file"""
+        import pandas as pd
+
+        if not self.pending:
+            return
+        part = os.path.join(self.path, f'part-{len(self.parts()):05d}.parquet')
+        pd.DataFrame(self.pending, columns=FIELDS).to_parquet(part + '.tmp', index=False)
+        os.replace(part + '.tmp', part)
+        self.pending = []
+
+    def close(self):
+        """Writes the remaining rows"""
+        self.flush()
+
+
+def prefetch(executor, paths, depth):
+    """Yields decoded images in order, keeping at most depth decodes in flight"""
+    paths = iter(paths)
+    in_flight = deque(executor.submit(decode, path) for path in islice(paths, depth))
+    while in_flight:
+        result = in_flight.popleft().result()
+        for path in islice(paths, 1):
+            in_flight.append(executor.submit(decode, path))
+        yield result
+
+
+def score_batch(batch, model_pool):
+    """Runs one batch of decoded images and returns its result rows"""
+    rows = []
+    images = [pixels for _, pixels, error in batch if error is None]
+    probabilities = iter(predict.invoke_images(images, model_pool) if images else [])
+    for path, _, error in batch:
+        row = {
+            'path': path,
+            'model_version': model_pool.version,
+            'model_digest': model_pool.digest,
+            'error': error or '',
+        }
+        if error is None:
+            probability = next(probabilities)
+            row['probability'] = probability
+            row['stroke'] = probability > predict.THRESHOLD
+        rows.append(row)
+    return rows
+
+
+def parse_args():
+    """Parses the command line"""
+    cpus = predict.available_cpus()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', help='Archive directory, or a text file listing image paths')
+    parser.add_argument('output', help='CSV file, or directory of Parquet part files')
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--model', default=predict.MODEL_PATH, help='TFLite model to score with')
+    parser.add_argument('--model-version', default=None, help='Version label written to output')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--prefetch', type=int, default=None,
+                        help='Decoded images kept ahead of inference (default: 4 batches)')
+    parser.add_argument('--rows-per-part', type=int, default=10000,
+                        help='Rows per Parquet part file, i.e. the Parquet checkpoint interval')
+    parser.add_argument('--workers', type=int, default=cpus, help='Decode processes')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Interpreter threads (default: the CPUs left over per decode process)')
+    args = parser.parse_args()
+    # Decode processes and interpreter threads share the CPUs
+    args.threads = args.threads or max(1, cpus // args.workers)
+    return args
+
+
+def main():
+    """Command line entry point"""
+    args = parse_args()
+    version = args.model_version or os.path.splitext(os.path.basename(args.model))[0]
+    model_pool = predict.InterpreterPool(args.model, 1, args.threads, version)
+    if args.format == 'parquet':
+        writer = ParquetWriter(args.output, args.rows_per_part)
+    else:
+        writer = CsvWriter(args.output)
+
+    paths = find_images(args.images)
+    done = writer.done(model_pool.digest)
+    todo = [path for path in paths if path not in done]
+    print(f'{len(paths)} images, {len(done)} already scored, {len(todo)} to go', file=sys.stderr)
+
+    start = time.perf_counter()
+    scored = 0
+    batch = []
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for item in prefetch(executor, todo, args.prefetch or 4 * args.batch_size):
+                batch.append(item)
+                if len(batch) == args.batch_size:
+                    writer.write(score_batch(batch, model_pool))
+                    scored += len(batch)
+                    batch = []
+                    rate = scored / (time.perf_counter() - start)
+                    print(f'\r{scored}/{len(todo)} scored ({rate:.1f} images/s)',
+                          end='', file=sys.stderr)
+            if batch:
+                writer.write(score_batch(batch, model_pool))
+                scored += len(batch)
+    finally:
+        # Buffered rows are written even if the run is interrupted
+        writer.close()
+    print(f'\r{scored}/{len(todo)} scored in {time.perf_counter() - start:.1f}s',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
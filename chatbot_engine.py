@@ -0,0 +1,203 @@
+"""Chatbot retrieval engine module
+
+Answers chatbot questions from the knowledge base with BM25 over a
+prebuilt inverted index. Each term's postings are NumPy arrays of entry
+indices and their precomputed BM25 weights, so answering a question is a
+few vectorized additions over the postings of its terms. Questions are normalized to
+their sorted terms, so rephrasings share entries in an LRU cache.
+Matches in an entry's question phrasings weigh more than matches in its
+answer (BM25F), since answers mention many neighbouring topics, and a
+question that is exactly one of an entry's phrasings ranks that entry first.
+"""
+
+import functools
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+import chatbot_knowledge
+
+
+CHATBOT_KNOWLEDGE_PATH = os.getenv('CHATBOT_KNOWLEDGE_PATH', '')
+CHATBOT_CACHE_SIZE = int(os.getenv('CHATBOT_CACHE_SIZE', '4096'))
+# Field weights: a question term counts this many answer terms
+QUESTION_WEIGHT = 3.0
+ANSWER_WEIGHT = 1.0
+MIN_SCORE = 1.0
+EXACT_MATCH_BONUS = 10.0
+K1 = 1.2
+B = 0.75
+STOPWORDS = frozenset(
+    'a an and are about be can do does for how i in is it me my of on or please should tell the to with you your'.split()
+)
+SYNONYMS = {
+    'woman': 'women',
+    'man': 'men',
+    'female': 'women',
+    'male': 'men',
+    'prevent': 'prevention',
+    'preventing': 'prevention',
+    'treat': 'treatment',
+    'safely': 'safe',
+    'safety': 'safe',
+    'recover': 'recovery',
+    'recovering': 'recovery',
+    'exercising': 'exercise',
+    'recommended': 'recommend',
+    'recommendation': 'recommend',
+    'rehab': 'rehabilitation',
+    'sign': 'symptom',
+}
+WELCOME_MESSAGE = (
+    "Welcome! I'm here to help you with stroke-related questions and rehabilitation guidance. "
+    "Type 'help' to see all topics, or click on the suggestions below."
+)
+FALLBACK_MESSAGE = (
+    "I don't understand that question. Type 'help' to see available topics, or try asking "
+    "about stroke symptoms, types, prevention, or treatment options."
+)
+INITIAL_SUGGESTIONS = ['What exercises are recommended?', 'How to exercise safely?', 'How to track progress?']
+FOLLOW_UPS = {
+    'general': ['What is a stroke?', 'Types of stroke?', 'Stroke symptoms?'],
+    'symptoms': ['Symptoms in women?', 'Symptoms in men?', 'Warning signs?'],
+    'emergency': ['What is FAST method?', 'Treatment options?', 'Recovery process?'],
+    'treatment': ['Recovery after stroke?', 'Rehabilitation exercises?', 'Exercise safety?'],
+    'prevention': ['Risk factors?', 'Prevention methods?', 'Treatment options?'],
+}
+
+
+def stem(word):
+    """Reduces a word to the form it is indexed under"""
+    if len(word) > 4 and word.endswith('ies'):
+        word = word[:-3] + 'y'
+    elif len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    return SYNONYMS.get(word, word)
+
+
+def tokenize(text):
+    """Splits text into lowercase, stemmed terms without stopwords"""
+    return [stem(word) for word in re.findall(r'[a-z0-9]+', text.lower()) if word not in STOPWORDS]
+
+
+def normalize(question):
+    """Returns the sorted distinct terms of a question, its cache key"""
+    return tuple(sorted(set(tokenize(question))))
+
+
+def load_entries(path=CHATBOT_KNOWLEDGE_PATH):
+    """Returns the built-in entries plus those of a JSON knowledge file, if given"""
+    entries = list(chatbot_knowledge.ENTRIES)
+    if path:
+        with open(path) as f:
+            entries.extend(json.load(f))
+    return entries
+
+
+class RetrievalEngine:
+    """BM25 search over knowledge base entries with an inverted index"""
+
+    def __init__(self, entries, cache_size=CHATBOT_CACHE_SIZE):
+        self.entries = entries
+        fields = [
+            (QUESTION_WEIGHT, [
+                Counter(tokenize(' '.join([entry['title'], *entry.get('questions', [])])))
+                for entry in entries
+            ]),
+            (ANSWER_WEIGHT, [Counter(tokenize(entry['answer'])) for entry in entries]),
+        ]
+        document_frequency = Counter(
+            term for doc in range(len(entries)) for term in set().union(*(f[doc] for _, f in fields))
+        )
+
+        # Length-normalized, weighted term frequency of each term in each entry
+        frequencies = defaultdict(lambda: defaultdict(float))
+        for weight, counts in fields:
+            lengths = [sum(c.values()) for c in counts]
+            average_length = sum(lengths) / max(len(lengths), 1) or 1
+            for doc, (c, length) in enumerate(zip(counts, lengths)):
+                norm = 1 - B + B * length / average_length
+                for term, tf in c.items():
+                    frequencies[term][doc] += weight * tf / norm
+
+        self.phrases = {}
+        for doc, entry in enumerate(entries):
+            for question in [entry['title'], *entry.get('questions', [])]:
+                self.phrases.setdefault(normalize(question), doc)
+
+        self.index = {}
+        for term, docs in frequencies.items():
+            df = document_frequency[term]
+            idf = math.log(1 + (len(entries) - df + 0.5) / (df + 0.5))
+            tf = np.fromiter(docs.values(), dtype='float64', count=len(docs))
+            self.index[term] = (
+                np.fromiter(docs.keys(), dtype='int64', count=len(docs)),
+                idf * tf * (K1 + 1) / (tf + K1),
+            )
+        self.search_normalized = functools.lru_cache(maxsize=cache_size)(self.rank)
+
+    def rank(self, terms, k=3):
+        """Returns the k best (score, entry index) pairs for normalized terms"""
+        scores = np.zeros(len(self.entries))
+        for term in terms:
+            if term in self.index:
+                docs, weights = self.index[term]
+                scores[docs] += weights
+        if terms in self.phrases:
+            scores[self.phrases[terms]] += EXACT_MATCH_BONUS
+        best = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        return tuple(
+            (float(scores[doc]), int(doc))
+            for doc in best[np.argsort(-scores[best], kind='stable')]
+            if scores[doc] > 0
+        )
+
+    def search(self, question, k=3):
+        """Returns the k best (score, entry) pairs for a question"""
+        return [(score, self.entries[doc]) for score, doc in self.search_normalized(normalize(question), k)]
+
+    def respond(self, question):
+        """Returns the answer of the best matching entry, or the fallback message"""
+        results = self.search(question, k=1)
+        if not results or results[0][0] < MIN_SCORE:
+            return FALLBACK_MESSAGE
+        return results[0][1]['answer']
+
+
+def suggest_follow_up(message):
+    """Suggests follow-up questions for a chatbot answer"""
+    message = message.lower()
+    if 'symptom' in message or 'sign' in message:
+        return FOLLOW_UPS['symptoms']
+    if 'emergency' in message or 'fast' in message:
+        return FOLLOW_UPS['emergency']
+    if 'treat' in message or 'recovery' in message:
+        return FOLLOW_UPS['treatment']
+    if 'prevent' in message or 'risk' in message:
+        return FOLLOW_UPS['prevention']
+    return FOLLOW_UPS['general']
+
+
+engine = None
+engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Returns the retrieval engine, indexed on first use"""
+    global engine
+    if engine is not None:
+        return engine
+    with engine_lock:
+        if engine is None:
+            engine = RetrievalEngine(load_entries())
+    return engine
+
+
+def respond(question):
+    """Answers a chatbot question"""
+    return get_engine().respond(question)
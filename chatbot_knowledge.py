@@ -0,0 +1,278 @@
+"""Chatbot knowledge base module
+
+Vetted question and answer entries served by chatbot_engine.py. Each entry
+has a title, alternative phrasings of its question and the answer text.
+More entries can be loaded from a JSON file with the same fields, see
+chatbot_engine.load_entries().
+"""
+
+
+ENTRIES = [
+    {
+        'title': 'what is stroke',
+        'questions': ['what is stroke', 'what is a stroke'],
+        'answer': """A stroke occurs when blood flow to the brain is interrupted, either by a blood clot (ischemic stroke) or burst blood vessel (hemorrhagic stroke). This interruption causes brain cells to die, leading to various symptoms and potential disabilities.""",
+    },
+    {
+        'title': 'what to do if someone has stroke',
+        'questions': ['what to do', 'emergency', 'fast method'],
+        'answer': """Immediate steps for stroke (FAST method):
+1. Face - Check if one side is drooping
+2. Arms - Can they raise both arms?
+3. Speech - Is it slurred or strange?
+4. Time - Call emergency services immediately
+
+Additional steps:
+- Note the time symptoms started
+- Keep the person still and calm
+- Monitor breathing
+- Do not give food or drink
+- Place them in recovery position if unconscious""",
+    },
+    {
+        'title': 'early warning signs',
+        'questions': ['early signs', 'warning signs', 'stroke symptoms'],
+        'answer': """Early warning signs of stroke:
+- Sudden severe headache
+- Difficulty understanding speech
+- Vision problems
+- Loss of balance
+- Facial drooping
+- Arm weakness
+- Numbness on one side
+- Confusion or trouble speaking
+
+Note: Even if symptoms go away, seek immediate medical attention.""",
+    },
+    {
+        'title': 'symptoms in women',
+        'questions': ['women symptoms', 'stroke symptoms in women'],
+        'answer': """Stroke symptoms specific to women:
+- Sudden face and limb pain
+- Sudden hiccups
+- Sudden nausea
+- Sudden chest pain
+- Sudden shortness of breath
+- General weakness
+- Disorientation and confusion
+- Fainting or loss of consciousness
+- Sudden behavioral changes
+- Agitation
+- Hallucination""",
+    },
+    {
+        'title': 'symptoms in men',
+        'questions': ['men symptoms', 'stroke symptoms in men'],
+        'answer': """Common stroke symptoms in men:
+- One-sided weakness or numbness
+- Vision problems in one or both eyes
+- Slurred speech or difficulty speaking
+- Confusion or trouble understanding
+- Severe headache with no known cause
+- Balance problems or dizziness
+- Difficulty walking
+- Loss of coordination
+- Sudden behavioral changes""",
+    },
+    {
+        'title': 'treatment options',
+        'questions': ['treatment', 'treatments'],
+        'answer': """Stroke treatment options:
+
+Immediate Treatments:
+- Clot-busting medications (for ischemic stroke)
+- Blood pressure management
+- Surgery to remove blood clots
+- Surgery to repair broken blood vessels
+- Medication to prevent blood clots
+
+Long-term Treatments:
+- Physical therapy
+- Occupational therapy
+- Speech therapy
+- Cognitive rehabilitation
+- Psychological support
+- Medications to prevent future strokes
+
+Prevention After Stroke:
+- Blood pressure management
+- Anticoagulation medication if needed
+- Lifestyle modifications
+- Regular medical check-ups""",
+    },
+    {
+        'title': 'types of stroke',
+        'questions': ['stroke types'],
+        'answer': """There are three main types of stroke:
+
+1. Ischemic Stroke:
+   - Caused by blood clots blocking arteries
+   - Most common type (87% of cases)
+   - Requires clot-busting medications
+
+2. Hemorrhagic Stroke:
+   - Caused by bleeding in the brain
+   - More severe but less common
+   - May require surgery
+
+3. Transient Ischemic Attack (TIA):
+   - Also called "mini-stroke"
+   - Temporary blockage
+   - Warning sign for future strokes
+   - Requires immediate medical attention""",
+    },
+    {
+        'title': 'recovery after stroke',
+        'questions': ['recovery', 'recovery process'],
+        'answer': """Stroke recovery process:
+
+Immediate Recovery (Hospital):
+- Medical stabilization
+- Initial rehabilitation assessment
+- Basic movement exercises
+- Swallowing evaluation
+
+Early Recovery (First Months):
+- Intensive rehabilitation
+- Physical therapy sessions
+- Speech therapy if needed
+- Occupational therapy
+- Learning adaptive techniques
+
+Long-term Recovery:
+- Continued therapy as needed
+- Home exercise program
+- Regular medical follow-up
+- Support group participation
+- Lifestyle modifications""",
+    },
+    {
+        'title': 'stroke risk factors',
+        'questions': ['risk factors'],
+        'answer': """Common risk factors for stroke include:
+1. Medical Conditions:
+   - High blood pressure
+   - Diabetes
+   - Heart disease
+   - High cholesterol
+   - Previous stroke or TIA
+
+2. Lifestyle Factors:
+   - Smoking
+   - Excessive alcohol use
+   - Lack of exercise
+   - Obesity
+   - Poor diet
+
+3. Other Factors:
+   - Age (risk increases with age)
+   - Family history
+   - Gender (more common in men)
+   - Race (higher risk in some ethnic groups)""",
+    },
+    {
+        'title': 'stroke prevention',
+        'questions': ['prevention', 'prevent stroke', 'prevention methods', 'how to prevent a stroke'],
+        'answer': """Key steps for stroke prevention:
+1. Medical Management:
+   - Regular blood pressure monitoring
+   - Control diabetes
+   - Manage heart conditions
+   - Take prescribed medications
+
+2. Lifestyle Changes:
+   - Quit smoking
+   - Limit alcohol intake
+   - Exercise regularly
+   - Maintain healthy weight
+   - Eat a balanced diet
+   - Reduce salt intake
+   - Control stress levels
+
+3. Regular Check-ups:
+   - Annual medical examinations
+   - Monitor cholesterol levels
+   - Check heart health
+   - Discuss risk factors with doctor""",
+    },
+    {
+        'title': 'rehabilitation exercises',
+        'questions': ['rehab exercises'],
+        'answer': """Common rehabilitation exercises include:
+- Arm Raises: Lift arms slowly to shoulder height, 10 repetitions
+- Leg Lifts: Lift legs while sitting/lying, 10 repetitions per leg
+- Hand Squeezes: Squeeze soft ball/towel, 15 repetitions per hand
+- Walking: Start with short distances, gradually increase
+- Balance Exercises: Stand on one leg, 10 seconds each side""",
+    },
+    {
+        'title': 'exercise recommendations',
+        'questions': ['exercises', 'recommended exercises', 'what exercises are recommended'],
+        'answer': """Recommended rehabilitation exercises:
+1. Motor Recovery:
+   - Arm raises and stretches
+   - Leg lifts and knee bends
+   - Hand and finger exercises
+   - Core strengthening
+   - Balance training
+
+2. Daily Living Skills:
+   - Dressing practice
+   - Eating and drinking exercises
+   - Writing and drawing tasks
+   - Object manipulation
+
+3. Mobility Training:
+   - Supported walking
+   - Stair practice
+   - Transfer training
+   - Gait exercises""",
+    },
+    {
+        'title': 'exercise safety',
+        'questions': ['safe exercise', 'how to exercise safely'],
+        'answer': """Safety guidelines for stroke rehabilitation:
+1. Before Exercise:
+   - Get medical clearance
+   - Start slowly
+   - Have supervision
+   - Set up a safe environment
+
+2. During Exercise:
+   - Stop if you feel pain
+   - Take frequent breaks
+   - Stay hydrated
+   - Monitor your breathing
+   - Don't overexert yourself
+
+3. Important Precautions:
+   - Use support when needed
+   - Avoid unstable surfaces
+   - Keep exercises simple initially
+   - Report any problems to your healthcare team""",
+    },
+    {
+        'title': 'help',
+        'questions': ['help', 'topics'],
+        'answer': """I can help you with information about:
+
+Stroke Information:
+- What is a stroke?
+- Types of stroke
+- Symptoms and warning signs
+- Risk factors
+- Prevention methods
+- Emergency response (FAST)
+- Treatment options
+- Gender-specific symptoms
+
+Rehabilitation & Recovery:
+- Recovery process
+- Recommended exercises
+- Exercise safety guidelines
+- Rehabilitation timeline
+- Progress tracking
+
+Type your question or click on suggestions below.""",
+    },
+]
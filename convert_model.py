@@ -0,0 +1,107 @@
+"""Model conversion module
+
+Converts the Keras classifier trained in notebook.ipynb into the TFLite
+variants served by predict.py:
+
+    python convert_model.py stroke_model.h5 data/ --images brain_ct_data
+
+writes data/model.tflite (float32), data/model_fp16.tflite (float16 weights),
+data/model_dynamic.tflite (int8 weights, float activations) and, when
+calibration images are given, data/model_int8.tflite (full integer with
+uint8 input and output).
+"""
+
+import argparse
+import glob
+import os
+import random
+
+import numpy as np
+import tensorflow as tf
+
+import preprocessing
+
+
+IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg')
+VARIANTS = ('float32', 'float16', 'dynamic', 'int8')
+
+
+def find_images(images_path):
+    """Lists the images of a flow_from_directory style dataset"""
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(images_path, '**', pattern), recursive=True))
+    return sorted(paths)
+
+
+def load_calibration_image(path):
+    """Loads an image the same way predict.py does, scaled to [0, 1]"""
+    return np.array(preprocessing.decode_image(path), dtype='float32') / 255
+
+
+def representative_dataset(paths, samples, seed=42):
+    """Builds the calibration generator expected by the TFLite converter"""
+    paths = random.Random(seed).sample(paths, min(samples, len(paths)))
+
+    def generator():
+        for path in paths:
+            yield [load_calibration_image(path)[np.newaxis]]
+
+    return generator
+
+
+def convert(model, variant, calibration_paths=None, samples=200):
+    """Converts a Keras model into the requested TFLite variant"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == 'dynamic':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif variant == 'int8':
+        if not calibration_paths:
+            raise ValueError('int8 conversion needs calibration images')
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calibration_paths, samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.uint8
+    return converter.convert()
+
+
+def output_name(variant):
+    """Returns the file name of a converted variant"""
+    if variant == 'float32':
+        return 'model.tflite'
+    if variant == 'float16':
+        return 'model_fp16.tflite'
+    return f'model_{variant}.tflite'
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('model', help='Keras model saved from notebook.ipynb (.h5 or .keras)')
+    parser.add_argument('output_dir', help='Directory receiving the .tflite files')
+    parser.add_argument('--images', help='Training images directory used for int8 calibration')
+    parser.add_argument('--samples', type=int, default=200, help='Number of calibration images')
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    args = parser.parse_args()
+
+    model = tf.keras.models.load_model(args.model)
+    calibration_paths = find_images(args.images) if args.images else []
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    for variant in args.variants:
+        if variant == 'int8' and not calibration_paths:
+            print('Skipping int8: no calibration images given (--images)')
+            continue
+        tflite_model = convert(model, variant, calibration_paths, args.samples)
+        path = os.path.join(args.output_dir, output_name(variant))
+        with open(path, 'wb') as f:
+            f.write(tflite_model)
+        print(f'Wrote {variant} model to {path} ({len(tflite_model) / 1e6:.1f} MB)')
+
+
+if __name__ == '__main__':
+    main()
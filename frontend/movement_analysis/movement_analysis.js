@@ -0,0 +1,283 @@
+// Exercise form analysis component. Talks to Streamlit with the
+// components v1 postMessage protocol: it receives the exercise options as
+// render arguments and reports each finished session as its value.
+
+let webcam, poseNet, isAnalyzing = false;
+let repCount = 0;
+let formScore = null;
+let exerciseState = {
+    armRaise: { count: 0, lastAngle: null, upwardPhase: false },
+    legLift: { count: 0, lastAngle: null, upwardPhase: false },
+    balance: { count: 0, startTime: null, totalTime: 0 }
+};
+
+function sendToStreamlit(type, data) {
+    window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: type }, data), '*');
+}
+
+function setFrameHeight() {
+    sendToStreamlit('streamlit:setFrameHeight', { height: document.body.scrollHeight });
+}
+
+function renderExercises(exercises) {
+    const select = document.getElementById('exerciseSelect');
+    const selected = select.value;
+    select.innerHTML = '';
+    Object.entries(exercises).forEach(([value, label]) => {
+        const option = document.createElement('option');
+        option.value = value;
+        option.textContent = label;
+        select.appendChild(option);
+    });
+    if (selected in exercises) {
+        select.value = selected;
+    }
+}
+
+window.addEventListener('message', (event) => {
+    if (event.data.type === 'streamlit:render') {
+        renderExercises(event.data.args.exercises || {});
+        setFrameHeight();
+    }
+});
+
+// Log status messages
+function logStatus(message) {
+    const statusDiv = document.getElementById('status-messages');
+    statusDiv.innerHTML += `<div>${message}</div>`;
+    setFrameHeight();
+    console.log(message);
+}
+
+// Log errors
+function logError(error) {
+    const errorDiv = document.getElementById('error-messages');
+    errorDiv.innerHTML += `<div>Error: ${error}</div>`;
+    setFrameHeight();
+    console.error(error);
+}
+
+function updateFeedback(message, type = 'info') {
+    const feedback = document.getElementById('feedback');
+    feedback.textContent = message;
+    feedback.style.backgroundColor = type === 'error' ? '#ffebee' : 
+                                   type === 'success' ? '#e8f5e9' : '#e3f2fd';
+}
+
+async function initializeCamera() {
+    try {
+        logStatus("Requesting camera permission...");
+        const stream = await navigator.mediaDevices.getUserMedia({ 
+            video: { 
+                width: 640, 
+                height: 480,
+                facingMode: 'user'
+            } 
+        });
+
+        const video = document.getElementById('webcam');
+        video.srcObject = stream;
+        logStatus("Camera initialized successfully!");
+
+        return new Promise((resolve) => {
+            video.onloadedmetadata = () => {
+                video.play();
+                resolve(video);
+            };
+        });
+    } catch (error) {
+        logError(`Camera initialization failed: ${error.message}`);
+        throw error;
+    }
+}
+
+async function loadPoseNet() {
+    try {
+        logStatus("Loading PoseNet...");
+        if (typeof posenet === 'undefined') {
+            throw new Error('PoseNet library not loaded');
+        }
+        const net = await posenet.load({
+            architecture: 'MobileNetV1',
+            outputStride: 16,
+            inputResolution: { width: 640, height: 480 },
+            multiplier: 0.75
+        });
+        logStatus("PoseNet loaded successfully!");
+        return net;
+    } catch (error) {
+        logError(`Failed to load PoseNet: ${error.message}`);
+        throw error;
+    }
+}
+
+function calculateAngle(p1, p2, p3) {
+    const radians = Math.atan2(p3.y - p2.y, p3.x - p2.x) -
+                  Math.atan2(p1.y - p2.y, p1.x - p2.x);
+    let angle = Math.abs(radians * 180.0 / Math.PI);
+    if (angle > 180.0) { angle = 360 - angle; }
+    return angle;
+}
+
+function analyzeArmRaise(keypoints) {
+    const leftShoulder = keypoints.find(k => k.part === 'leftShoulder');
+    const leftElbow = keypoints.find(k => k.part === 'leftElbow');
+    const leftWrist = keypoints.find(k => k.part === 'leftWrist');
+
+    if (leftShoulder && leftElbow && leftWrist) {
+        const angle = calculateAngle(
+            leftShoulder.position,
+            leftElbow.position,
+            leftWrist.position
+        );
+
+        formScore = 0;
+        if (angle > 160) {
+            formScore = 100;
+            updateFeedback("Perfect form!", "success");
+        } else if (angle > 140) {
+            formScore = 80;
+            updateFeedback("Good form!", "success");
+        } else if (angle > 120) {
+            formScore = 60;
+            updateFeedback("Raise your arms a bit higher");
+        } else {
+            formScore = 40;
+            updateFeedback("Try to raise your arms higher");
+        }
+
+        document.getElementById('form-score').textContent = formScore + '%';
+
+        // Rep counting logic
+        if (angle > 150 && !exerciseState.armRaise.upwardPhase) {
+            exerciseState.armRaise.upwardPhase = true;
+        } else if (angle < 60 && exerciseState.armRaise.upwardPhase) {
+            exerciseState.armRaise.count++;
+            exerciseState.armRaise.upwardPhase = false;
+            document.getElementById('rep-count').textContent = exerciseState.armRaise.count;
+        }
+    }
+}
+
+function analyzeLegLift(keypoints) {
+    const leftHip = keypoints.find(k => k.part === 'leftHip');
+    const leftKnee = keypoints.find(k => k.part === 'leftKnee');
+    const leftAnkle = keypoints.find(k => k.part === 'leftAnkle');
+
+    if (leftHip && leftKnee && leftAnkle) {
+        const angle = calculateAngle(
+            leftHip.position,
+            leftKnee.position,
+            leftAnkle.position
+        );
+
+        formScore = 0;
+        if (angle > 150) {
+            formScore = 100;
+            updateFeedback("Perfect leg lift!", "success");
+        } else if (angle > 130) {
+            formScore = 80;
+            updateFeedback("Good form!", "success");
+        } else if (angle > 110) {
+            formScore = 60;
+            updateFeedback("Lift your leg higher");
+        } else {
+            formScore = 40;
+            updateFeedback("Try to lift your leg higher");
+        }
+
+        document.getElementById('form-score').textContent = formScore + '%';
+
+        // Rep counting logic
+        if (angle > 130 && !exerciseState.legLift.upwardPhase) {
+            exerciseState.legLift.upwardPhase = true;
+        } else if (angle < 90 && exerciseState.legLift.upwardPhase) {
+            exerciseState.legLift.count++;
+            exerciseState.legLift.upwardPhase = false;
+            document.getElementById('rep-count').textContent = exerciseState.legLift.count;
+        }
+    }
+}
+
+async function detectPose() {
+    if (!isAnalyzing) return;
+
+    try {
+        const pose = await poseNet.estimateSinglePose(webcam, {
+            flipHorizontal: true
+        });
+
+        if (pose.score > 0.2) {
+            const exercise = document.getElementById('exerciseSelect').value;
+            switch(exercise) {
+                case 'arm-raise':
+                    analyzeArmRaise(pose.keypoints);
+                    break;
+                case 'leg-lift':
+                    analyzeLegLift(pose.keypoints);
+                    break;
+            }
+        }
+
+        if (isAnalyzing) {
+            requestAnimationFrame(detectPose);
+        }
+    } catch (error) {
+        logError(`Pose detection error: ${error.message}`);
+    }
+}
+
+async function startAnalysis() {
+    try {
+        if (!isAnalyzing) {
+            // Reset state
+            exerciseState = {
+                armRaise: { count: 0, lastAngle: null, upwardPhase: false },
+                legLift: { count: 0, lastAngle: null, upwardPhase: false },
+                balance: { count: 0, startTime: null, totalTime: 0 }
+            };
+            formScore = null;
+            document.getElementById('rep-count').textContent = '0';
+            document.getElementById('form-score').textContent = '-';
+
+            // Initialize camera and PoseNet
+            webcam = await initializeCamera();
+            if (!poseNet) {
+                poseNet = await loadPoseNet();
+            }
+
+            isAnalyzing = true;
+            document.getElementById('startBtn').textContent = 'Stop Analysis';
+            document.getElementById('current-exercise').textContent = 
+                document.getElementById('exerciseSelect').value;
+
+            detectPose();
+            updateFeedback("Analysis started. Perform the exercise.");
+        } else {
+            isAnalyzing = false;
+            document.getElementById('startBtn').textContent = 'Start Analysis';
+            updateFeedback("Analysis stopped.");
+            reportSession();
+        }
+    } catch (error) {
+        logError(`Failed to start analysis: ${error.message}`);
+        updateFeedback("Failed to start analysis. Please refresh and try again.", "error");
+    }
+}
+
+// Reports the finished session to Streamlit, which reruns the page with it
+function reportSession() {
+    const counts = { 'arm-raise': exerciseState.armRaise.count, 'leg-lift': exerciseState.legLift.count };
+    const exercise = document.getElementById('current-exercise').textContent;
+    sendToStreamlit('streamlit:setComponentValue', {
+        value: { exercise: exercise, repetitions: counts[exercise] || 0, form_score: formScore },
+        dataType: 'json'
+    });
+}
+
+document.getElementById('startBtn').addEventListener('click', startAnalysis);
+
+// Initialize the system
+logStatus("System initialized. Click Start to begin analysis.");
+updateFeedback("Select an exercise and click Start to begin");
+sendToStreamlit('streamlit:componentReady', { apiVersion: 1 });
@@ -0,0 +1,40 @@
+"""Import profiling module
+
+Streamlit re-executes app.py on every interaction, so app.py imports its
+heavy modules lazily, page by page, through timed_import(). The first
+import of each module is timed and printed, and the first run of the
+script reports its total time, so first-paint latency can be tracked.
+"""
+
+import importlib
+import sys
+import time
+
+
+PROCESS_START = time.perf_counter()
+timings = {}
+first_run_reported = False
+
+
+def timed_import(name):
+    """Imports a module, printing how long it took the first time"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    timings[name] = time.perf_counter() - start
+    print(f'[startup] import {name}: {timings[name] * 1000:.1f} ms')
+    return module
+
+
+def report_first_run(script_start):
+    """Prints the duration of the first script run and of the imports it made"""
+    global first_run_reported
+    if first_run_reported:
+        return
+    first_run_reported = True
+    now = time.perf_counter()
+    print(f'[startup] first run: {(now - script_start) * 1000:.1f} ms '
+          f'({(now - PROCESS_START) * 1000:.1f} ms since process start), '
+          f'imports: {sum(timings.values()) * 1000:.1f} ms')
@@ -0,0 +1,154 @@
+"""Metrics module
+
+Minimal, thread-safe counters, gauges and histograms rendered in the
+Prometheus text exposition format. Each update is a bisect plus a few
+integer additions under a per-metric lock, cheap enough for every request.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def format_value(value):
+    """Formats a sample value the way Prometheus expects"""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing counter"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """Adds amount to the counter"""
+        with self.lock:
+            self.value += amount
+
+    def samples(self):
+        """Returns the (name, value) samples of the metric"""
+        return [(self.name, self.value)]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def dec(self, amount=1):
+        """Subtracts amount from the gauge"""
+        self.inc(-amount)
+
+    def set(self, value):
+        """Sets the gauge to value"""
+        with self.lock:
+            self.value = value
+
+    @contextmanager
+    def track_inprogress(self):
+        """Increments the gauge for the duration of the block"""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Histogram:
+    """Cumulative histogram of observed values, usually durations in seconds"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        """Records one observation"""
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def count(self):
+        """Returns the number of observations so far"""
+        with self.lock:
+            return sum(self.counts)
+
+    @contextmanager
+    def time(self):
+        """Observes the wall-clock duration of the block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self):
+        """Returns the (name, value) samples of the metric"""
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            samples.append((f'{self.name}_bucket{{le="{format_value(bound)}"}}', cumulative))
+        samples.append((f'{self.name}_sum', total))
+        samples.append((f'{self.name}_count', cumulative))
+        return samples
+
+
+class Registry:
+    """Collection of metrics rendered together by a /metrics endpoint"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """Adds a metric to the registry and returns it"""
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation):
+        """Creates and registers a counter"""
+        return self.register(Counter(name, documentation))
+
+    def gauge(self, name, documentation):
+        """Creates and registers a gauge"""
+        return self.register(Gauge(name, documentation))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        """Creates and registers a histogram"""
+        return self.register(Histogram(name, documentation, buckets))
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, value in metric.samples():
+                lines.append(f'{name} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
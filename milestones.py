@@ -0,0 +1,105 @@
+"""Milestone prediction module
+
+Vectorized version of RehabMLAnalysis.predict_milestones() for any number
+of patients. Sessions are grouped by (patient, exercise) once, and every
+group's session count, current score and improvement rate come from a few
+bincounts over the columnar table, so a clinic's full exercise history of
+millions of rows is scored in seconds. The improvement rate is the mean
+difference between consecutive performance scores, which is the change
+from the first to the last session over the number of steps, or with
+method='lstsq' the least-squares slope of score against session number,
+which one unusual first or last session moves less. For the nightly report
+over the patient store:
+
+    python milestones.py --method lstsq --output milestones.csv
+"""
+
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+import patient_store
+
+
+TARGET_SCORE = 0.8
+MIN_SESSIONS = 5
+# Rates below this many score points per session are treated as flat
+MIN_RATE = 1e-6
+METHODS = ['diff', 'lstsq']
+
+
+def predict_milestones(df, patient_column='patient_id', method='diff', target=TARGET_SCORE,
+                       min_sessions=MIN_SESSIONS, now=None):
+    """Predicts when each (patient, exercise) reaches the target score
+
+    df holds one session per row, in the order they were done, with
+    exercise and performance_score columns, and patient_column unless it
+    is None. Returns one row per group with at least min_sessions sessions,
+    an improvement rate of at least MIN_RATE and a predicted date that a
+    datetime can hold, in order of first appearance.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Method must be one of {', '.join(METHODS)}")
+    keys = ['exercise'] if patient_column is None else [patient_column, 'exercise']
+    groups = df.groupby(keys, sort=False, dropna=False)
+    codes = groups.ngroup().to_numpy()
+    position = groups.cumcount().to_numpy()
+    scores = df['performance_score'].to_numpy(dtype='float64')
+
+    sessions = np.bincount(codes)
+    first = np.empty(len(sessions))
+    first[codes[position == 0]] = scores[position == 0]
+    is_last = position == sessions[codes] - 1
+    current = np.empty(len(sessions))
+    current[codes[is_last]] = scores[is_last]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'diff':
+            # Consecutive differences telescope to last minus first
+            rate = (current - first) / (sessions - 1)
+        else:
+            # Slope against session number 0..n-1, whose sum of squared
+            # deviations is n(n^2-1)/12. Scores are centred on their group's
+            # mean first, so a flat history sums to zero instead of to the
+            # rounding error left by cancelling two large sums
+            mean = np.bincount(codes, weights=scores) / sessions
+            sum_xy = np.bincount(codes, weights=position * (scores - mean[codes]))
+            rate = sum_xy / (sessions * (sessions ** 2 - 1) / 12)
+        days = (target - current) / rate
+
+    # Slow enough improvement puts the date past what a datetime can hold,
+    # and those groups are left out rather than given a NaT
+    now = now or datetime.now()
+    eligible = (
+        (sessions >= min_sessions) & (rate >= MIN_RATE)
+        & (days > (datetime.min - now).days) & (days < (datetime.max - now).days)
+    )
+    # Codes number the groups in order of first appearance
+    result = df.loc[position == 0, keys][eligible].reset_index(drop=True)
+    return result.assign(
+        sessions=sessions[eligible],
+        current_score=current[eligible],
+        improvement_rate=rate[eligible],
+        days_to_milestone=days[eligible],
+        predicted_date=np.datetime64(now, 's') + (days[eligible] * 86400).astype('timedelta64[s]'),
+        target_score=target,
+    )
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--method', choices=METHODS, default='diff', help='Improvement rate estimate')
+    parser.add_argument('--db', default=patient_store.PATIENT_DB_PATH, help='Patient store database')
+    parser.add_argument('--output', default='milestones.csv', help='Output CSV')
+    args = parser.parse_args()
+
+    history = patient_store.PatientStore(args.db).export('exercise_history')
+    milestones = predict_milestones(history, method=args.method)
+    milestones.to_csv(args.output, index=False, date_format='%Y-%m-%d')
+    print(f'Predicted {len(milestones)} milestones from {len(history)} sessions to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
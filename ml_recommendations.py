@@ -1,108 +1,115 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from textblob import TextBlob
-from datetime import datetime, timedelta
 import plotly.graph_objects as go
 import plotly.express as px
+import milestones
+import patient_store
 
-# Run this in a Python console once
-import nltk
-nltk.download('punkt')
-nltk.download('averaged_perceptron_tagger')
+NLTK_DATA = [
+    ('tokenizers/punkt', 'punkt'),
+    ('taggers/averaged_perceptron_tagger', 'averaged_perceptron_tagger'),
+]
+
+def ensure_nltk_data():
+    """Downloads the NLTK corpora TextBlob needs, only if they are not installed locally"""
+    import nltk
+    
+    for path, package in NLTK_DATA:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(package, quiet=True)
 
 class RehabMLAnalysis:
-    def __init__(self):
-        if 'exercise_history' not in st.session_state:
-            st.session_state.exercise_history = []
-        if 'emotional_scores' not in st.session_state:
-            st.session_state.emotional_scores = []
+    def __init__(self, patient_id):
+        self.patient_id = patient_id
+        self.store = patient_store.get_store()
+    
+    def exercise_history(self):
+        """Recent exercise sessions of the patient, oldest first"""
+        return self.store.history('exercise_history', self.patient_id)
+    
+    def exercise_stats(self):
+        """Running per-exercise statistics of the patient, updated as sessions are logged"""
+        return self.store.exercise_stats(self.patient_id)
+    
+    def emotional_scores(self):
+        """Recent emotional scores of the patient, oldest first"""
+        return self.store.history('emotional_scores', self.patient_id)
             
     def analyze_sentiment(self, notes):
         """Analyze sentiment of progress notes"""
         if not notes:
             return 0
         
+        from textblob import TextBlob
+        
         analysis = TextBlob(notes)
         return analysis.sentiment.polarity
     
-    def get_exercise_recommendations(self, progress_data):
-        """Generate personalized exercise recommendations based on progress"""
-        if not progress_data:
-            return []
-            
-        df = pd.DataFrame(progress_data)
-        
-        # Calculate exercise frequency and performance
-        exercise_stats = df.groupby('exercise').agg({
-            'duration': ['mean', 'count'],
-            'completion_rate': 'mean'
-        }).reset_index()
-        
+    def get_exercise_recommendations(self, exercise_stats):
+        """Generate personalized exercise recommendations from per-exercise statistics"""
         recommendations = []
         
         # Analyze each exercise
-        for _, row in exercise_stats.iterrows():
-            exercise = row['exercise']
-            freq = row[('duration', 'count')]
-            avg_duration = row[('duration', 'mean')]
-            completion = row[('completion_rate', 'mean')]
-            
-            if freq < 3:
-                recommendations.append(f"Try to do more {exercise} sessions")
-            if completion < 0.7:
-                recommendations.append(f"Focus on completing full sets of {exercise}")
-            if avg_duration < 10:
-                recommendations.append(f"Gradually increase duration of {exercise}")
+        for row in exercise_stats.itertuples(index=False):
+            if row.count < 3:
+                recommendations.append(f"Try to do more {row.exercise} sessions")
+            if row.mean_completion_rate < 0.7:
+                recommendations.append(f"Focus on completing full sets of {row.exercise}")
+            if row.mean_duration < 10:
+                recommendations.append(f"Gradually increase duration of {row.exercise}")
                 
         return recommendations
     
-    def predict_milestones(self, progress_data):
+    def predict_milestones(self, progress_data, method='diff'):
         """Predict recovery milestones based on progress patterns"""
-        if not progress_data:
+        if len(progress_data) == 0:
             return []
             
-        df = pd.DataFrame(progress_data)
-        
-        # Calculate improvement rates
-        df['improvement_rate'] = df.groupby('exercise')['performance_score'].diff()
-        
-        milestones = []
-        for exercise in df['exercise'].unique():
-            exercise_data = df[df['exercise'] == exercise]
-            
-            if len(exercise_data) >= 5:  # Need minimum data points
-                avg_improvement = exercise_data['improvement_rate'].mean()
-                current_score = exercise_data['performance_score'].iloc[-1]
-                
-                # Predict time to reach next milestone
-                if avg_improvement > 0:
-                    days_to_milestone = (0.8 - current_score) / avg_improvement
-                    milestone_date = datetime.now() + timedelta(days=days_to_milestone)
-                    
-                    milestones.append({
-                        'exercise': exercise,
-                        'predicted_date': milestone_date.strftime('%Y-%m-%d'),
-                        'target_score': 0.8
-                    })
-                    
-        return milestones
+        predicted = milestones.predict_milestones(
+            pd.DataFrame(progress_data), patient_column=None, method=method
+        )
+        return [
+            {
+                'exercise': row.exercise,
+                'predicted_date': row.predicted_date.strftime('%Y-%m-%d'),
+                'target_score': row.target_score
+            }
+            for row in predicted.itertuples(index=False)
+        ]
 
 def ml_analysis_interface():
     """ML Analysis Interface"""
     st.subheader("🤖 AI Analysis & Recommendations")
     
-    ml_analyzer = RehabMLAnalysis()
+    ml_analyzer = RehabMLAnalysis(st.session_state.patient_id)
+    
+    # Exercise Logging
+    with st.form("log_exercise", clear_on_submit=True):
+        st.write("### Log an Exercise Session")
+        exercise = st.text_input("Exercise")
+        duration = st.number_input("Duration (minutes)", min_value=0.0, value=10.0)
+        completion_rate = st.slider("Completion Rate", 0.0, 1.0, 1.0, 0.05)
+        performance_score = st.slider("Performance Score", 0.0, 1.0, 0.5, 0.05)
+        if st.form_submit_button("Log Session") and exercise:
+            ml_analyzer.store.append('exercise_history', ml_analyzer.patient_id, {
+                'exercise': exercise,
+                'duration': duration,
+                'completion_rate': completion_rate,
+                'performance_score': performance_score
+            })
     
     # Progress Notes Analysis
     st.write("### Sentiment Analysis of Progress Notes")
     notes = st.text_area("Enter your progress notes")
     if notes:
         sentiment = ml_analyzer.analyze_sentiment(notes)
-        st.session_state.emotional_scores.append({
-            'date': datetime.now().strftime('%Y-%m-%d'),
-            'score': sentiment
-        })
+        # Reruns keep the text area filled, so each note is stored once
+        if st.session_state.get('analyzed_notes') != notes:
+            ml_analyzer.store.append('emotional_scores', ml_analyzer.patient_id, {'score': sentiment})
+            st.session_state.analyzed_notes = notes
         
         # Display sentiment analysis
         st.write(f"Sentiment Score: {sentiment:.2f}")
@@ -112,37 +119,36 @@ def ml_analysis_interface():
             st.warning("Consider talking to your healthcare provider about any concerns.")
             
         # Plot emotional trend
-        if st.session_state.emotional_scores:
-            df_emotions = pd.DataFrame(st.session_state.emotional_scores)
+        df_emotions = ml_analyzer.emotional_scores()
+        if not df_emotions.empty:
             fig = px.line(df_emotions, x='date', y='score', 
                          title='Emotional Wellbeing Trend')
             st.plotly_chart(fig)
     
     # Exercise Recommendations
     st.write("### Personalized Recommendations")
-    if st.session_state.exercise_history:
+    exercise_history = ml_analyzer.exercise_history()
+    if not exercise_history.empty:
         recommendations = ml_analyzer.get_exercise_recommendations(
-            st.session_state.exercise_history
+            ml_analyzer.exercise_stats()
         )
         for rec in recommendations:
             st.info(rec)
             
         # Milestone Predictions
         st.write("### Predicted Milestones")
-        milestones = ml_analyzer.predict_milestones(
-            st.session_state.exercise_history
+        predicted = ml_analyzer.predict_milestones(
+            exercise_history
         )
-        if milestones:
-            for milestone in milestones:
+        if predicted:
+            for milestone in predicted:
                 st.write(f"🎯 {milestone['exercise']}: Target score of {milestone['target_score']} "
                         f"predicted by {milestone['predicted_date']}")
                         
         # Progress Visualization
         st.write("### Progress Analysis")
-        df_progress = pd.DataFrame(st.session_state.exercise_history)
-        if not df_progress.empty:
-            fig = px.scatter(df_progress, x='date', y='performance_score',
-                           color='exercise', title='Exercise Performance Over Time')
-            st.plotly_chart(fig)
+        fig = px.scatter(exercise_history, x='date', y='performance_score',
+                         color='exercise', title='Exercise Performance Over Time')
+        st.plotly_chart(fig)
     else:
         st.info("Start logging your exercises to get personalized recommendations!")
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""Patient store module
+
+Persists per-patient histories (risk scores, exercise sessions, emotional
+scores and chat messages) in SQLite instead of unbounded session_state
+lists. The database runs in WAL mode so Streamlit sessions can read while
+another one appends, every table is indexed on (patient_id, date), and
+reads are windowed so a session only ever holds the recent slice of a
+patient's history in memory. Per-exercise statistics (session count, mean
+duration and mean completion rate) are kept up to date incrementally as
+sessions are logged, so reading them never scans the history. Patients
+with no new record for PATIENT_RETENTION_DAYS are deleted when the store
+is opened.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+
+PATIENT_DB_PATH = os.getenv('PATIENT_DB_PATH', 'data/patients.db')
+HISTORY_LIMIT = int(os.getenv('HISTORY_LIMIT', '1000'))
+# 0 keeps every patient forever
+PATIENT_RETENTION_DAYS = float(os.getenv('PATIENT_RETENTION_DAYS', '365'))
+TABLES = {
+    'risk_history': {'risk_score': 'REAL', 'risk_level': 'TEXT'},
+    'exercise_history': {
+        'exercise': 'TEXT',
+        'duration': 'REAL',
+        'completion_rate': 'REAL',
+        'performance_score': 'REAL',
+    },
+    'emotional_scores': {'score': 'REAL'},
+    'chat_history': {'role': 'TEXT', 'message': 'TEXT'},
+}
+EXERCISE_STATS_COLUMNS = ['count', 'mean_duration', 'mean_completion_rate']
+# Running means, updated in O(1) per session; on conflict, the right-hand
+# sides all see the row as it was before the update
+UPDATE_EXERCISE_STATS = '''
+    INSERT INTO exercise_stats (patient_id, exercise, count, mean_duration, mean_completion_rate)
+    VALUES (?, ?, 1, ?, ?)
+    ON CONFLICT (patient_id, exercise) DO UPDATE SET
+        count = count + 1,
+        mean_duration = mean_duration + (excluded.mean_duration - mean_duration) / (count + 1),
+        mean_completion_rate =
+            mean_completion_rate + (excluded.mean_completion_rate - mean_completion_rate) / (count + 1)
+'''
+
+
+class PatientStore:
+    """SQLite store of timestamped patient records, one table per history"""
+
+    def __init__(self, path=PATIENT_DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.connection() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            for table, columns in TABLES.items():
+                definitions = ''.join(f', {name} {kind}' for name, kind in columns.items())
+                db.execute(
+                    f'CREATE TABLE IF NOT EXISTS {table} ('
+                    f'id INTEGER PRIMARY KEY, patient_id TEXT NOT NULL, date TEXT NOT NULL{definitions})'
+                )
+                db.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table}_patient_date ON {table} (patient_id, date)'
+                )
+            self.create_exercise_stats(db)
+
+    def create_exercise_stats(self, db):
+        """Creates the per-exercise statistics table, filling it from any existing history"""
+        exists = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'exercise_stats'"
+        ).fetchone()
+        if exists:
+            return
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS exercise_stats (patient_id TEXT NOT NULL, exercise TEXT NOT NULL, '
+            'count INTEGER NOT NULL, mean_duration REAL, mean_completion_rate REAL, '
+            'PRIMARY KEY (patient_id, exercise))'
+        )
+        db.execute(
+            'INSERT OR IGNORE INTO exercise_stats '
+            'SELECT patient_id, exercise, COUNT(*), AVG(duration), AVG(completion_rate) '
+            'FROM exercise_history GROUP BY patient_id, exercise'
+        )
+
+    def connection(self):
+        """Returns this thread's connection, since SQLite connections are not shared"""
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self.local.db = db
+        return db
+
+    def append(self, table, patient_id, rows, date=None):
+        """Appends records to a patient's history, stamped with date or now"""
+        columns = list(TABLES[table])
+        date = date or datetime.now().isoformat(timespec='seconds')
+        values = [
+            (patient_id, row.get('date', date), *(row.get(column) for column in columns))
+            for row in ([rows] if isinstance(rows, dict) else rows)
+        ]
+        with self.connection() as db:
+            db.executemany(
+                f'INSERT INTO {table} (patient_id, date, {", ".join(columns)}) '
+                f'VALUES ({", ".join("?" * (len(columns) + 2))})',
+                values,
+            )
+            if table == 'exercise_history':
+                db.executemany(UPDATE_EXERCISE_STATS, [
+                    (patient_id, value[2], value[3], value[4]) for value in values
+                ])
+
+    def history(self, table, patient_id, start=None, end=None, limit=HISTORY_LIMIT):
+        """Returns the latest records of a patient between start and end, oldest first"""
+        columns = ', '.join(['date', *TABLES[table]])
+        query = f'SELECT {columns} FROM {table} WHERE patient_id = ?'
+        params = [patient_id]
+        if start is not None:
+            query += ' AND date >= ?'
+            params.append(str(start))
+        if end is not None:
+            query += ' AND date < ?'
+            params.append(str(end))
+        query += ' ORDER BY date DESC, id DESC LIMIT ?'
+        params.append(-1 if limit is None else limit)
+        df = pd.read_sql_query(query, self.connection(), params=params)
+        return df.iloc[::-1].reset_index(drop=True)
+
+    def export(self, table):
+        """Returns every patient's records of a table, ordered by patient and date"""
+        columns = ', '.join(['patient_id', 'date', *TABLES[table]])
+        return pd.read_sql_query(
+            f'SELECT {columns} FROM {table} ORDER BY patient_id, date, id', self.connection()
+        )
+
+    def exercise_stats(self, patient_id):
+        """Returns the session count, mean duration and mean completion rate of each exercise"""
+        return pd.read_sql_query(
+            f'SELECT exercise, {", ".join(EXERCISE_STATS_COLUMNS)} FROM exercise_stats '
+            'WHERE patient_id = ? ORDER BY exercise',
+            self.connection(),
+            params=[patient_id],
+        )
+
+    def purge_inactive(self, days):
+        """Deletes every record of the patients with no record newer than days, returning how many"""
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat(timespec='seconds')
+        dates = ' UNION ALL '.join(f'SELECT patient_id, date FROM {table}' for table in TABLES)
+        with self.connection() as db:
+            db.execute(
+                f'CREATE TEMP TABLE inactive AS SELECT patient_id FROM ({dates}) '
+                'GROUP BY patient_id HAVING MAX(date) < ?',
+                (cutoff,),
+            )
+            try:
+                purged = db.execute('SELECT COUNT(*) FROM temp.inactive').fetchone()[0]
+                for table in [*TABLES, 'exercise_stats']:
+                    db.execute(
+                        f'DELETE FROM {table} WHERE patient_id IN (SELECT patient_id FROM temp.inactive)'
+                    )
+            finally:
+                db.execute('DROP TABLE temp.inactive')
+        return purged
+
+    def count(self, table, patient_id):
+        """Returns the number of records in a patient's history"""
+        return self.connection().execute(
+            f'SELECT COUNT(*) FROM {table} WHERE patient_id = ?', (patient_id,)
+        ).fetchone()[0]
+
+
+store = None
+store_lock = threading.Lock()
+
+
+def get_store():
+    """Returns the patient store, opened on first use"""
+    global store
+    if store is not None:
+        return store
+    with store_lock:
+        if store is None:
+            store = PatientStore()
+            if PATIENT_RETENTION_DAYS > 0:
+                store.purge_inactive(PATIENT_RETENTION_DAYS)
+    return store
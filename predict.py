@@ -1,83 +1,1134 @@
 """Prediction module"""
 
+import functools
+import hashlib
+import io
+import math
 import os
+import queue
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
 
 import numpy as np
 from PIL import Image
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 
-if os.path.exists('/.dockerenv'):
-    import tflite_runtime.interpreter as tflite
-else:
-    import tensorflow.lite as tflite
+import metrics
+from preprocessing import (
+    TARGET_SIZE, TENSOR_SHAPE, open_image, pixel_lookup_table, preprocess_into, quantize, resize_image,
+)
 
 
 EXPERIMENT_NAME = os.getenv('EXPERIMENT_NAME', 'brain-stroke-detector')
 MODEL_PATH = os.getenv('MODEL_PATH', 'data/model.tflite')
-TARGET_SIZE = (224, 224)
+MODEL_DIR = os.getenv('MODEL_DIR', os.path.dirname(MODEL_PATH) or '.')
+MODEL_VERSION = os.getenv('MODEL_VERSION', os.path.splitext(os.path.basename(MODEL_PATH))[0])
+JSON_MIMETYPE = 'application/json'
+RAW_MIMETYPE = 'application/octet-stream'
+NPY_MIMETYPE = 'application/x-npy'
 PREDICT_URL = '/predict'
+PREDICT_BATCH_URL = '/predict/batch'
+PREDICT_CACHE_URL = '/predict/cache'
+PREDICT_VOLUME_URL = '/predict/volume'
+RISK_BATCH_URL = '/risk/batch'
+STARTUP_URL = '/startup'
+MODELS_URL = '/models'
+METRICS_URL = '/metrics'
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+THRESHOLD = 0.5
+MICRO_BATCH_WINDOW_MS = float(os.getenv('MICRO_BATCH_WINDOW_MS', '0'))
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', '16'))
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '1024'))
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', '3600'))
+PREDICT_WARMUP = os.getenv('PREDICT_WARMUP', '0') == '1'
+VOLUME_BATCH_SIZE = int(os.getenv('VOLUME_BATCH_SIZE', '16'))
+VOLUME_MIN_POSITIVE_SLICES = int(os.getenv('VOLUME_MIN_POSITIVE_SLICES', '1'))
+NIFTI_SUFFIXES = ('.nii.gz', '.nii')
+AUTOTUNE = os.getenv('AUTOTUNE', '0') == '1'
+AUTOTUNE_PATH = os.getenv('AUTOTUNE_PATH', os.path.join(MODEL_DIR, 'autotune.json'))
+AUTOTUNE_ATTEMPTS = int(os.getenv('AUTOTUNE_ATTEMPTS', '3'))
+AUTOTUNE_RETRY_SECONDS = float(os.getenv('AUTOTUNE_RETRY_SECONDS', '60'))
+
+
+def available_cpus():
+    """Returns the number of CPUs this process may use, honouring cgroup quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+INTERPRETER_POOL_SIZE = int(os.getenv('INTERPRETER_POOL_SIZE', str(available_cpus())))
+INTERPRETER_NUM_THREADS = int(
+    os.getenv('INTERPRETER_NUM_THREADS', str(max(1, available_cpus() // INTERPRETER_POOL_SIZE)))
+)
+
+
+def max_active_requests(pool_size):
+    """Returns enough concurrent requests to fill a micro-batch on every interpreter"""
+    return pool_size * (MICRO_BATCH_MAX_SIZE if MICRO_BATCH_WINDOW_MS > 0 else 1)
+
+
+# Unless set explicitly, the limit follows the size of the active pool
+MAX_ACTIVE_REQUESTS_FIXED = 'MAX_ACTIVE_REQUESTS' in os.environ
+MAX_ACTIVE_REQUESTS = int(os.getenv('MAX_ACTIVE_REQUESTS', str(max_active_requests(INTERPRETER_POOL_SIZE))))
+MAX_QUEUE_DEPTH = int(os.getenv('MAX_QUEUE_DEPTH', '64'))
+RETRY_AFTER_SECONDS = int(os.getenv('RETRY_AFTER_SECONDS', '1'))
 
 
 app = Flask(EXPERIMENT_NAME)
 
-interpreter = tflite.Interpreter(model_path=MODEL_PATH)
-interpreter.allocate_tensors()
-input_index = interpreter.get_input_details()[0]['index']
-output_index = interpreter.get_output_details()[0]['index']
+metrics_registry = metrics.Registry()
+upload_read_seconds = metrics_registry.histogram(
+    'predict_upload_read_seconds', 'Time spent reading uploaded bytes')
+decode_seconds = metrics_registry.histogram(
+    'predict_decode_seconds', 'Time spent decoding images in open_image')
+resize_seconds = metrics_registry.histogram(
+    'predict_resize_seconds', 'Time spent in resize_image')
+array_conversion_seconds = metrics_registry.histogram(
+    'predict_array_conversion_seconds', 'Time spent writing pixels into the input tensor')
+invoke_seconds = metrics_registry.histogram(
+    'predict_invoke_seconds', 'Time spent in interpreter invoke')
+request_seconds = metrics_registry.histogram(
+    'predict_request_seconds', 'Total time spent handling prediction requests')
+errors_total = metrics_registry.counter(
+    'predict_errors_total', 'Prediction requests answered with an error')
+in_flight_requests = metrics_registry.gauge(
+    'predict_in_flight_requests', 'Prediction requests currently being handled')
+queue_depth = metrics_registry.gauge(
+    'predict_queue_depth', 'Prediction requests waiting for an execution slot')
+rejected_total = metrics_registry.counter(
+    'predict_rejected_total', 'Prediction requests rejected because the queue was full')
+deadline_exceeded_total = metrics_registry.counter(
+    'predict_deadline_exceeded_total', 'Prediction requests dropped after their deadline passed')
+
+
+# time.monotonic() deadline of the request being handled, None for no deadline
+current_deadline = ContextVar('current_deadline', default=None)
+
+
+class QueueFull(Exception):
+    """Raised when a request arrives while the admission queue is full"""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes before its inference runs"""
+
+
+def check_deadline(deadline=None):
+    """Raises DeadlineExceeded if the given or current request deadline has passed"""
+    deadline = deadline if deadline is not None else current_deadline.get()
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceeded('Request deadline exceeded before inference')
+
+
+startup_timings = {}
+tflite = None
+tflite_lock = threading.Lock()
+
+
+def load_tflite():
+    """Imports the TFLite interpreter module on first use"""
+    global tflite
+    if tflite is not None:
+        return tflite
+    with tflite_lock:
+        if tflite is None:
+            start = time.perf_counter()
+            if os.path.exists('/.dockerenv'):
+                import tflite_runtime.interpreter as tflite_module
+            else:
+                import tensorflow.lite as tflite_module
+            startup_timings['tflite_import_seconds'] = time.perf_counter() - start
+            tflite = tflite_module
+    return tflite
+
+
+def file_digest(path):
+    """Returns the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dequantize(q, quantization):
+    """Maps a quantized output tensor back to float values"""
+    scale, zero_point = quantization
+    return (q.astype('float32') - zero_point) * scale
+
+
+def op_resolver_options(interpreter_module, use_xnnpack):
+    """Returns the Interpreter keyword arguments that turn XNNPACK off if asked"""
+    if use_xnnpack:
+        return {}
+    resolver_type = getattr(interpreter_module, 'OpResolverType', None)
+    if resolver_type is None:
+        resolver_type = interpreter_module.experimental.OpResolverType
+    return {'experimental_op_resolver_type': resolver_type.BUILTIN_WITHOUT_DEFAULT_DELEGATES}
+
+
+class ModelInterpreter:
+    """A TFLite interpreter with its own tensors, used by one thread at a time
+
+    Interpreters created with record_metrics=False, such as the autotuner's,
+    leave the service's latency metrics and startup timings alone.
+    """
+
+    def __init__(self, model_path, num_threads, use_xnnpack=True, record_metrics=True):
+        self.record_metrics = record_metrics
+        interpreter_module = load_tflite()
+        start = time.perf_counter()
+        self.interpreter = interpreter_module.Interpreter(
+            model_path=model_path,
+            num_threads=num_threads,
+            **op_resolver_options(interpreter_module, use_xnnpack),
+        )
+        self.interpreter.allocate_tensors()
+        if record_metrics:
+            startup_timings.setdefault('model_load_seconds', time.perf_counter() - start)
+        input_details = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()[0]
+        self.input_index = input_details['index']
+        self.output_index = output_details['index']
+        self.input_shape = list(input_details['shape'])
+        self.input_dtype = input_details['dtype']
+        self.input_quantization = input_details['quantization']
+        self.output_quantization = output_details['quantization']
+        self.quantized_output = np.issubdtype(output_details['dtype'], np.integer)
+        self.pixel_lut = pixel_lookup_table(self.input_dtype, self.input_quantization)
+
+    def resize_batch(self, batch_size):
+        """Resizes the interpreter input tensor to the given batch size"""
+        if self.input_shape[0] == batch_size:
+            return
+        self.input_shape[0] = batch_size
+        self.interpreter.resize_tensor_input(self.input_index, self.input_shape)
+        self.interpreter.allocate_tensors()
+
+    def conversion_timer(self):
+        """Times the conversion of inputs into the input tensor, if metrics are recorded"""
+        return array_conversion_seconds.time() if self.record_metrics else nullcontext()
+
+    def run(self):
+        """Invokes the interpreter and returns one probability per batch item"""
+        start = time.perf_counter()
+        self.interpreter.invoke()
+        elapsed = time.perf_counter() - start
+        if self.record_metrics:
+            invoke_seconds.observe(elapsed)
+            startup_timings.setdefault('first_inference_seconds', elapsed)
+        preds = self.interpreter.get_tensor(self.output_index)
+        if self.quantized_output:
+            preds = dequantize(preds, self.output_quantization)
+        return [float(p[0]) for p in preds]
+
+    def invoke_batch(self, X):
+        """Runs a preprocessed batch through a single interpreter invoke"""
+        self.resize_batch(len(X))
+        with self.conversion_timer():
+            if np.issubdtype(self.input_dtype, np.integer):
+                X = quantize(X, self.input_dtype, self.input_quantization)
+            self.interpreter.set_tensor(self.input_index, X.astype(self.input_dtype, copy=False))
+        return self.run()
+
+    def invoke_images(self, images):
+        """Normalizes resized images directly into the input tensor and invokes"""
+        self.resize_batch(len(images))
+        with self.conversion_timer():
+            input_buffer = self.interpreter.tensor(self.input_index)()
+            for i, img in enumerate(images):
+                preprocess_into(img, input_buffer[i], self.pixel_lut)
+        # The interpreter refuses to invoke while a view of its buffers is alive
+        del input_buffer
+        return self.run()
+
+
+class InterpreterPool:
+    """Bounded pool of interpreters, created on demand up to its size"""
+
+    def __init__(self, model_path, size, num_threads, version=None,
+                 use_xnnpack=True, max_batch_size=None, digest=None):
+        self.model_path = model_path
+        self.version = version
+        self.digest = digest or file_digest(model_path)
+        self.size = size
+        self.num_threads = num_threads
+        self.use_xnnpack = use_xnnpack
+        self.max_batch_size = max_batch_size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def _acquire(self):
+        """Takes an idle interpreter, creates one, or waits for a checkin"""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        if not create:
+            return self.idle.get()
+        try:
+            return ModelInterpreter(self.model_path, self.num_threads, self.use_xnnpack)
+        except Exception:
+            with self.lock:
+                self.created -= 1
+            raise
+
+    @contextmanager
+    def checkout(self):
+        """Lends an interpreter to the caller and returns it to the pool afterwards"""
+        model_interpreter = self._acquire()
+        try:
+            yield model_interpreter
+        finally:
+            self.idle.put(model_interpreter)
+
+
+def autotuned_settings(digest):
+    """Returns the stored interpreter settings for this model and host, or None if not tuned yet"""
+    import autotune
+
+    config = autotune.load_config(AUTOTUNE_PATH, digest)
+    if config is None:
+        return None
+    return {
+        'size': config['pool_size'],
+        'num_threads': config['num_threads'],
+        'use_xnnpack': config['use_xnnpack'],
+        'max_batch_size': config['batch_size'],
+    }
+
+
+def warm_up(model_pool):
+    """Loads an interpreter of the pool and runs one invoke on a dummy batch"""
+    with model_pool.checkout() as model_interpreter:
+        X = np.zeros([1] + model_interpreter.input_shape[1:], dtype='float32')
+        model_interpreter.invoke_batch(X)
+
+
+class ModelRegistry:
+    """Versioned interpreter pools with an atomically swappable active version
+
+    Requests take a reference to the active pool once and finish on it, so a
+    newly activated version only affects requests that start after the swap.
+    """
+
+    def __init__(self, model_dir, default_version, default_path, pool_size, num_threads):
+        self.model_dir = model_dir
+        self.default_version = default_version
+        self.default_path = default_path
+        self.pool_size = pool_size
+        self.num_threads = num_threads
+        self.pools = {}
+        self.active = None
+        self.loading = set()
+        self.tuning = set()
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.default_lock = threading.Lock()
+
+    def model_path(self, version):
+        """Returns the .tflite file of a version stored in the model directory"""
+        if version == self.default_version:
+            return self.default_path
+        if version in ('', '.', '..') or os.path.basename(version) != version:
+            raise ValueError(f'Invalid model version {version!r}')
+        return os.path.join(self.model_dir, f'{version}.tflite')
+
+    def available(self):
+        """Lists the versions stored in the model directory"""
+        try:
+            names = os.listdir(self.model_dir)
+        except OSError:
+            return []
+        return sorted(os.path.splitext(name)[0] for name in names if name.endswith('.tflite'))
+
+    def load(self, version, warm=True):
+        """Creates (and warms up) the pool of a version without activating it"""
+        with self.lock:
+            if version in self.pools:
+                return self.pools[version]
+        model_path = self.model_path(version)
+        digest = file_digest(model_path)
+        settings = {'size': self.pool_size, 'num_threads': self.num_threads}
+        tuned = autotuned_settings(digest) if AUTOTUNE else None
+        if tuned is not None:
+            settings = tuned
+        model_pool = InterpreterPool(model_path, version=version, digest=digest, **settings)
+        if warm:
+            warm_up(model_pool)
+        # After the warm-up, whose invoke would otherwise void the first measurement
+        if AUTOTUNE and tuned is None:
+            self.autotune_in_background(version, model_path, digest)
+        with self.lock:
+            return self.pools.setdefault(version, model_pool)
+
+    def activate(self, version, warm=True):
+        """Loads a version if needed, then routes all new requests to it"""
+        model_pool = self.load(version, warm)
+        self.active = model_pool
+        size_for_pool(model_pool)
+        return model_pool
+
+    def activate_in_background(self, version):
+        """Loads and activates a version on a background thread"""
+        self.model_path(version)
+        with self.lock:
+            self.loading.add(version)
+            self.errors.pop(version, None)
+
+        def run():
+            try:
+                self.activate(version)
+                print(f'Model version {version} is now active')
+            except Exception as e:
+                print(f'Failed to activate model version {version}: {e}')
+                with self.lock:
+                    self.errors[version] = str(e)
+            finally:
+                with self.lock:
+                    self.loading.discard(version)
+
+        thread = threading.Thread(target=run, name=f'model-load-{version}', daemon=True)
+        thread.start()
+        return thread
+
+    def autotune_in_background(self, version, model_path, digest):
+        """Tunes a version on a background thread, then reloads it with the tuned settings
+
+        Until tuning finishes the version is served with the default settings.
+        Since the grid shares the CPUs with the service, a measurement during
+        which the service ran an inference is thrown away and retried after
+        AUTOTUNE_RETRY_SECONDS, up to AUTOTUNE_ATTEMPTS times, so skewed
+        results are never stored.
+        """
+        with self.lock:
+            if version in self.tuning:
+                return None
+            self.tuning.add(version)
+
+        def run():
+            import autotune
+
+            try:
+                print(f'Autotuning {model_path} in the background, this runs once per model and host')
+                for attempt in range(AUTOTUNE_ATTEMPTS):
+                    if attempt:
+                        time.sleep(AUTOTUNE_RETRY_SECONDS)
+                    invokes = invoke_seconds.count()
+                    config = autotune.tune(model_path, digest)
+                    if invoke_seconds.count() == invokes:
+                        break
+                    print(f'Discarding autotune results for model version {version}, '
+                          f'the service ran inferences while it was measured')
+                else:
+                    print(f'Gave up autotuning model version {version}; '
+                          f'run autotune.py while the service is idle')
+                    return
+                autotune.save_config(AUTOTUNE_PATH, config)
+                with self.lock:
+                    untuned = self.pools.pop(version, None)
+                # Requests already on the untuned pool finish on it
+                if untuned is not None and self.active is untuned:
+                    self.activate(version)
+                elif untuned is not None:
+                    self.load(version)
+                print(f'Model version {version} now runs with autotuned settings')
+            except Exception as e:
+                print(f'Failed to autotune model version {version}: {e}')
+            finally:
+                with self.lock:
+                    self.tuning.discard(version)
+
+        thread = threading.Thread(target=run, name=f'model-autotune-{version}', daemon=True)
+        thread.start()
+        return thread
+
+    def unload(self, version):
+        """Drops an inactive version; requests still using it finish normally"""
+        active = self.active
+        if active is not None and active.version == version:
+            raise ValueError(f'Model version {version} is active')
+        with self.lock:
+            if self.pools.pop(version, None) is None:
+                raise ValueError(f'Model version {version} is not loaded')
+
+    def active_pool(self, warm=False):
+        """Returns the active pool, loading the default version on first use"""
+        model_pool = self.active
+        if model_pool is not None:
+            return model_pool
+        with self.default_lock:
+            if self.active is None:
+                self.activate(self.default_version, warm)
+        return self.active
+
+    def status(self):
+        """Describes the active, loaded, loading and available versions"""
+        active = self.active
+        with self.lock:
+            return {
+                'active': active.version if active is not None else None,
+                'loaded': {
+                    version: {'path': model_pool.model_path, 'digest': model_pool.digest}
+                    for version, model_pool in self.pools.items()
+                },
+                'loading': sorted(self.loading),
+                'tuning': sorted(self.tuning),
+                'errors': dict(self.errors),
+                'available': self.available(),
+            }
+
+
+model_registry = ModelRegistry(
+    MODEL_DIR, MODEL_VERSION, MODEL_PATH, INTERPRETER_POOL_SIZE, INTERPRETER_NUM_THREADS
+)
+
+
+def get_pool():
+    """Returns the interpreter pool of the active model version"""
+    return model_registry.active_pool()
+
+
+def warm_up_active():
+    """Warms up the active model version and prints the startup timings"""
+    model_pool = model_registry.active
+    if model_pool is None:
+        # Loading warms it up before any autotuning starts
+        model_registry.active_pool(warm=True)
+    else:
+        warm_up(model_pool)
+    print(f'Prediction model warmed up: {startup_report()}')
+
+
+def start_warm_up():
+    """Warms the model up in a background thread so startup is not blocked"""
+    thread = threading.Thread(target=warm_up_active, name='predict-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def startup_report():
+    """Returns the TFLite import, model load and first inference times"""
+    return {
+        name: startup_timings.get(name)
+        for name in ('tflite_import_seconds', 'model_load_seconds', 'first_inference_seconds')
+    }
+
+
+class PredictionCache:
+    """Thread-safe LRU cache of probabilities with a size bound and a TTL"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the cached value for key, or None if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Stores value under key, evicting the least recently used entries"""
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        """Returns the hit/miss counters and current occupancy"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+
+
+def read_upload(file):
+    """Returns the raw bytes of an uploaded file, a path or a file-like object"""
+    with upload_read_seconds.time():
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'rb') as f:
+                return f.read()
+        if hasattr(file, 'getvalue'):
+            return file.getvalue()
+        return file.read()
+
+
+def cache_key(data, model_pool):
+    """Identifies an upload by its content and the model that scores it"""
+    return model_pool.digest, hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def load_image(file):
+    """Decodes and resizes an uploaded image, letting JPEG decode at reduced scale"""
+    with decode_seconds.time():
+        img = open_image(file)
+    with resize_seconds.time():
+        return resize_image(img)
+
+
+def invoke_batch(X, model_pool=None):
+    """Runs a preprocessed batch on an interpreter checked out of the pool"""
+    with (model_pool or get_pool()).checkout() as model_interpreter:
+        return model_interpreter.invoke_batch(X)
 
 
-def prepare_image(file):
-    """Creates an image from the webserver input"""
-    img = Image.open(file)
-    return img
+def invoke_images(images, model_pool=None):
+    """Runs resized images on an interpreter checked out of the pool
 
+    Batches larger than the pool's tuned batch size are split into invokes
+    of that size.
+    """
+    model_pool = model_pool or get_pool()
+    step = model_pool.max_batch_size or max(len(images), 1)
+    with model_pool.checkout() as model_interpreter:
+        return [
+            p
+            for i in range(0, len(images), step)
+            for p in model_interpreter.invoke_images(images[i:i + step])
+        ]
 
-def resize_image(img, target_size):
-    """Resizes the image to the target value"""
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
-    img = img.resize(target_size, Image.NEAREST)
-    return img
 
+class MicroBatcher:
+    """Collects concurrent single-image requests into batched invokes"""
 
-def preprocess_input(x):
-    """Pre-processes the input image"""
-    x /= 255
-    return x
+    def __init__(self, run_batch, window_ms, max_size, workers=1):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self.queue = queue.Queue()
+        self.workers = 0
+        self.running = 0
+        self.lock = threading.Lock()
+        self.resize(workers)
 
+    def resize(self, workers):
+        """Starts workers up to the given number; surplus ones stop after their current batch"""
+        with self.lock:
+            self.workers = workers
+            while self.running < workers:
+                threading.Thread(target=self._loop, daemon=True).start()
+                self.running += 1
 
-def predict(file):
+    def retire(self):
+        """Tells whether the calling worker is surplus, counting it out if so"""
+        with self.lock:
+            if self.running > self.workers:
+                self.running -= 1
+                return True
+            return False
+
+    def submit(self, img, model_pool, deadline=None):
+        """Queues one resized image and returns a future for its output"""
+        future = Future()
+        self.queue.put((img, model_pool, future, deadline))
+        return future
+
+    def _collect(self):
+        """Waits for a first item, then gathers more until the window closes"""
+        items = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(items) < self.max_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                items.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return items
+
+    def _loop(self):
+        """Runs collected items as one batch per model and fans results back out"""
+        while not self.retire():
+            batches = {}
+            for img, model_pool, future, deadline in self._collect():
+                try:
+                    check_deadline(deadline)
+                except DeadlineExceeded as e:
+                    future.set_exception(e)
+                    continue
+                batches.setdefault(model_pool, []).append((img, future))
+            for model_pool, items in batches.items():
+                try:
+                    results = self.run_batch([img for img, _ in items], model_pool)
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(items, results):
+                    future.set_result(result)
+
+
+batcher = None
+batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """Returns the micro-batcher, started on first use, or None if disabled"""
+    global batcher
+    if MICRO_BATCH_WINDOW_MS <= 0:
+        return None
+    with batcher_lock:
+        if batcher is None:
+            batcher = MicroBatcher(
+                invoke_images, MICRO_BATCH_WINDOW_MS, MICRO_BATCH_MAX_SIZE, workers=get_pool().size
+            )
+    return batcher
+
+
+def size_for_pool(model_pool):
+    """Sizes admission control and the micro-batcher to a newly active pool"""
+    if not MAX_ACTIVE_REQUESTS_FIXED:
+        admission.resize(max_active_requests(model_pool.size))
+    if batcher is not None:
+        batcher.resize(model_pool.size)
+
+
+def score_with_cache(keys, load, model_pool):
+    """Returns cached probabilities and scores the misses, loaded by index, together"""
+    probabilities = [cache.get(key) for key in keys]
+    missing = [i for i, p in enumerate(probabilities) if p is None]
+    if not missing:
+        return probabilities
+    images = [load(i) for i in missing]
+    check_deadline()
+    micro_batcher = get_batcher()
+    if micro_batcher is not None and len(images) == 1:
+        scores = [micro_batcher.submit(images[0], model_pool, current_deadline.get()).result()]
+    else:
+        scores = invoke_images(images, model_pool)
+    for i, p in zip(missing, scores):
+        cache.put(keys[i], p)
+        probabilities[i] = p
+    return probabilities
+
+
+def predict_proba_batch(files, model_pool=None):
+    """Returns the stroke probability of each file, in order"""
+    model_pool = model_pool or get_pool()
+    uploads = [read_upload(file) for file in files]
+    keys = [cache_key(data, model_pool) for data in uploads]
+    return score_with_cache(keys, lambda i: load_image(io.BytesIO(uploads[i])), model_pool)
+
+
+def predict_proba(file, model_pool=None):
+    """Returns the stroke probability of a single file"""
+    return predict_proba_batch([file], model_pool)[0]
+
+
+def parse_tensor(data, mimetype):
+    """Validates a raw or .npy body of pre-sized uint8 images, without copying"""
+    if mimetype == NPY_MIMETYPE:
+        pixels = np.load(io.BytesIO(data), allow_pickle=False)
+    else:
+        image_bytes = int(np.prod(TENSOR_SHAPE))
+        if not data or len(data) % image_bytes:
+            raise ValueError(f'Raw body must be a multiple of {image_bytes} bytes')
+        pixels = np.frombuffer(data, dtype=np.uint8).reshape((-1,) + TENSOR_SHAPE)
+    if pixels.dtype != np.uint8:
+        raise ValueError(f'Expected uint8 pixels, got {pixels.dtype}')
+    if pixels.shape == TENSOR_SHAPE:
+        pixels = pixels[np.newaxis]
+    if pixels.shape[1:] != TENSOR_SHAPE or len(pixels) == 0:
+        raise ValueError(f'Expected images of shape {TENSOR_SHAPE}, got {pixels.shape}')
+    return np.ascontiguousarray(pixels)
+
+
+def predict_proba_pixels(pixels, model_pool=None):
+    """Returns the stroke probability of each pre-sized uint8 image, skipping decode"""
+    model_pool = model_pool or get_pool()
+    keys = [cache_key(memoryview(x), model_pool) for x in pixels]
+    return score_with_cache(keys, lambda i: pixels[i], model_pool)
+
+
+def predict(file, model_pool=None):
     """Performs the prediction"""
-    img = prepare_image(file)
-    img = resize_image(img, target_size=TARGET_SIZE)
+    return predict_proba(file, model_pool) > THRESHOLD
+
+
+def slice_to_image(slice_data):
+    """Scales a 2D volume slice to 8 bits by its maximum, as in the notebook"""
+    slice_data = np.nan_to_num(np.asarray(slice_data, dtype='float32'))
+    peak = slice_data.max()
+    if peak > 0:
+        slice_data *= 255 / peak
+    return Image.fromarray(np.clip(slice_data, 0, 255).astype('uint8'), mode='L')
+
+
+def iter_volume_slices(path):
+    """Yields the axial slices of a NIfTI volume one at a time from its data proxy"""
+    import nibabel as nib
+
+    volume = nib.load(path, mmap=True, keep_file_open=True)
+    proxy = volume.dataobj
+    extra_axes = (0,) * (len(proxy.shape) - 3)
+    for k in range(proxy.shape[2]):
+        yield slice_to_image(proxy[(slice(None), slice(None), k) + extra_axes])
+
+
+def predict_volume(path, batch_size=None, model_pool=None):
+    """Scores every slice of a NIfTI volume in bounded batches"""
+    model_pool = model_pool or get_pool()
+    batch_size = batch_size or model_pool.max_batch_size or VOLUME_BATCH_SIZE
+    probabilities = []
+    batch = []
+    for img in iter_volume_slices(path):
+        batch.append(resize_image(img, target_size=TARGET_SIZE))
+        if len(batch) == batch_size:
+            check_deadline()
+            probabilities.extend(invoke_images(batch, model_pool))
+            batch = []
+    if batch:
+        check_deadline()
+        probabilities.extend(invoke_images(batch, model_pool))
+
+    positive_slices = sum(p > THRESHOLD for p in probabilities)
+    return {
+        'slices': [{'index': k, 'probability': p} for k, p in enumerate(probabilities)],
+        'positive_slices': positive_slices,
+        'max_probability': max(probabilities, default=0.0),
+        'stroke': positive_slices >= VOLUME_MIN_POSITIVE_SLICES,
+    }
+
+
+def track_request(endpoint):
+    """Counts in-flight requests and times each call of a prediction endpoint"""
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        with in_flight_requests.track_inprogress(), request_seconds.time():
+            return endpoint(*args, **kwargs)
+
+    return wrapper
+
+
+class AdmissionController:
+    """Bounds the prediction requests running at once and those queued behind them"""
+
+    def __init__(self, max_active, max_queue_depth):
+        self.max_active = max_active
+        self.max_queue_depth = max_queue_depth
+        self.active = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+    def resize(self, max_active):
+        """Changes the number of requests allowed to run at once"""
+        with self.condition:
+            self.max_active = max_active
+            self.condition.notify_all()
+
+    def has_slot(self):
+        """Tells whether another request may run, called with the condition held"""
+        return self.active < self.max_active
+
+    @contextmanager
+    def admit(self, deadline=None):
+        """Waits for an execution slot, unless the queue is full or the deadline passes"""
+        with self.condition:
+            if not self.has_slot():
+                if self.waiting >= self.max_queue_depth:
+                    raise QueueFull('Prediction queue is full')
+                self.waiting += 1
+                queue_depth.set(self.waiting)
+                try:
+                    timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                    acquired = self.condition.wait_for(self.has_slot, timeout)
+                finally:
+                    self.waiting -= 1
+                    queue_depth.set(self.waiting)
+                if not acquired:
+                    raise DeadlineExceeded('Request deadline exceeded while queued')
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.condition.notify()
+
+
+admission = AdmissionController(MAX_ACTIVE_REQUESTS, MAX_QUEUE_DEPTH)
+
+
+def request_deadline():
+    """Turns the request's deadline header, in milliseconds from now, into a monotonic time"""
+    value = request.headers.get(DEADLINE_HEADER)
+    if value is None:
+        return None
+    milliseconds = float(value)
+    if not math.isfinite(milliseconds) or milliseconds <= 0:
+        raise ValueError(f'{DEADLINE_HEADER} must be a positive number of milliseconds')
+    return time.monotonic() + milliseconds / 1000
+
+
+def admission_control(endpoint):
+    """Queues a prediction endpoint behind the admission controller
+
+    Requests beyond the queue depth get 503 with Retry-After, and requests
+    whose deadline passes before inference get 504 without being scored.
+    """
 
-    x = np.array(img, dtype='float32')
-    X = np.array([x])
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        try:
+            deadline = request_deadline()
+        except ValueError:
+            errors_total.inc()
+            return jsonify({'Error': f'Invalid {DEADLINE_HEADER} header'}), 400
+        try:
+            with admission.admit(deadline):
+                token = current_deadline.set(deadline)
+                try:
+                    return endpoint(*args, **kwargs)
+                finally:
+                    current_deadline.reset(token)
+        except QueueFull as e:
+            rejected_total.inc()
+            return jsonify({'Error': str(e)}), 503, {'Retry-After': str(RETRY_AFTER_SECONDS)}
+        except DeadlineExceeded as e:
+            deadline_exceeded_total.inc()
+            return jsonify({'Error': str(e)}), 504
 
-    X = preprocess_input(X)
+    return wrapper
 
-    interpreter.set_tensor(input_index, X)
-    interpreter.invoke()
-    preds = interpreter.get_tensor(output_index)
-    float_predictions = preds[0].tolist()
 
-    return float_predictions[0] > 0.5
+def is_tensor_request():
+    """Tells whether the request body carries raw pixels instead of an upload"""
+    return request.mimetype in (RAW_MIMETYPE, NPY_MIMETYPE)
+
+
+def probabilities_response(probabilities, model_pool):
+    """Encodes batch probabilities as JSON, raw little-endian float32 or .npy"""
+    mimetype = request.accept_mimetypes.best_match(
+        [JSON_MIMETYPE, RAW_MIMETYPE, NPY_MIMETYPE], default=JSON_MIMETYPE
+    )
+    if mimetype == JSON_MIMETYPE:
+        return jsonify({'model_version': model_pool.version, 'probabilities': probabilities})
+    values = np.asarray(probabilities, dtype='<f4')
+    if mimetype == NPY_MIMETYPE:
+        buffer = io.BytesIO()
+        np.save(buffer, values)
+        body = buffer.getvalue()
+    else:
+        body = values.tobytes()
+    return Response(body, mimetype=mimetype, headers={'X-Model-Version': model_pool.version})
 
 
 @app.route(PREDICT_URL, methods=["POST"])
+@track_request
+@admission_control
 def predict_endpoint():
     """Prediction endpoint"""
     try:
+        if is_tensor_request():
+            model_pool = get_pool()
+            pixels = parse_tensor(request.get_data(), request.mimetype)
+            if len(pixels) != 1:
+                raise ValueError(f'Expected one image, got {len(pixels)}; use {PREDICT_BATCH_URL}')
+            return jsonify({
+                'stroke': predict_proba_pixels(pixels, model_pool)[0] > THRESHOLD,
+                'model_version': model_pool.version,
+            })
+
         uploaded_img = request.files['img']
         if uploaded_img.filename != '':
             print(f'Received image {uploaded_img.filename}')
-            return jsonify({'stroke': predict(uploaded_img)})
+            model_pool = get_pool()
+            return jsonify({
+                'stroke': predict(uploaded_img, model_pool),
+                'model_version': model_pool.version,
+            })
+
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        errors_total.inc()
+        return jsonify({'Error': str(e)})
+
+    errors_total.inc()
+    return jsonify({'Error': 'Generic error'})
+
+
+@app.route(PREDICT_BATCH_URL, methods=["POST"])
+@track_request
+@admission_control
+def predict_batch_endpoint():
+    """Batch prediction endpoint, one invoke for all uploaded images"""
+    try:
+        if is_tensor_request():
+            model_pool = get_pool()
+            pixels = parse_tensor(request.get_data(), request.mimetype)
+            print(f'Received tensor batch of {len(pixels)} images')
+            return probabilities_response(predict_proba_pixels(pixels, model_pool), model_pool)
+
+        uploaded_imgs = [f for f in request.files.getlist('img') if f.filename != '']
+        if uploaded_imgs:
+            print(f'Received batch of {len(uploaded_imgs)} images')
+            model_pool = get_pool()
+            probabilities = predict_proba_batch(uploaded_imgs, model_pool)
+            return jsonify({
+                'model_version': model_pool.version,
+                'predictions': [
+                    {
+                        'filename': f.filename,
+                        'probability': p,
+                        'stroke': p > THRESHOLD,
+                    }
+                    for f, p in zip(uploaded_imgs, probabilities)
+                ]
+            })
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
+        errors_total.inc()
         return jsonify({'Error': str(e)})
 
+    errors_total.inc()
     return jsonify({'Error': 'Generic error'})
 
 
+@app.route(PREDICT_VOLUME_URL, methods=["POST"])
+@track_request
+@admission_control
+def predict_volume_endpoint():
+    """Whole-volume prediction endpoint for NIfTI uploads"""
+    try:
+        uploaded_volume = request.files['volume']
+        suffix = next(
+            (s for s in NIFTI_SUFFIXES if uploaded_volume.filename.lower().endswith(s)), None
+        )
+        if suffix is not None:
+            print(f'Received volume {uploaded_volume.filename}')
+            model_pool = get_pool()
+            # nibabel reads slices lazily from a file, so the upload is spooled to disk
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = os.path.join(tmpdir, f'volume{suffix}')
+                uploaded_volume.save(path)
+                result = predict_volume(path, model_pool=model_pool)
+            return jsonify({'model_version': model_pool.version, **result})
+
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        errors_total.inc()
+        return jsonify({'Error': str(e)})
+
+    errors_total.inc()
+    return jsonify({'Error': 'Expected a .nii or .nii.gz volume'})
+
+
+@app.route(RISK_BATCH_URL, methods=["POST"])
+@track_request
+@admission_control
+def risk_batch_endpoint():
+    """Tabular stroke risk endpoint, one model call for all feature rows"""
+    try:
+        import risk_model
+
+        rows = request.get_json()['rows']
+        print(f'Received {len(rows)} risk feature rows')
+        return jsonify({'probabilities': risk_model.predict_risk_batch(rows)})
+
+    except Exception as e:
+        errors_total.inc()
+        return jsonify({'Error': str(e)})
+
+
+@app.route(PREDICT_CACHE_URL, methods=["GET"])
+def predict_cache_endpoint():
+    """Prediction cache statistics endpoint"""
+    return jsonify(cache.stats())
+
+
+@app.route(MODELS_URL, methods=["GET"])
+def models_endpoint():
+    """Model registry status endpoint"""
+    return jsonify(model_registry.status())
+
+
+@app.route(f'{MODELS_URL}/<version>', methods=["POST"])
+def activate_model_endpoint(version):
+    """Loads a model version in the background and swaps it in when ready"""
+    try:
+        model_registry.activate_in_background(version)
+        return jsonify({'loading': version})
+    except Exception as e:
+        return jsonify({'Error': str(e)})
+
+
+@app.route(f'{MODELS_URL}/<version>', methods=["DELETE"])
+def unload_model_endpoint(version):
+    """Unloads an inactive model version"""
+    try:
+        model_registry.unload(version)
+        return jsonify({'unloaded': version})
+    except Exception as e:
+        return jsonify({'Error': str(e)})
+
+
+@app.route(STARTUP_URL, methods=["GET"])
+def startup_endpoint():
+    """Startup timing report endpoint"""
+    return jsonify(startup_report())
+
+
+@app.route(METRICS_URL, methods=["GET"])
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(metrics_registry.render(), mimetype=metrics.CONTENT_TYPE)
+
+
+# With AUTOTUNE, loading the model at startup also starts tuning it if needed
+if PREDICT_WARMUP or AUTOTUNE:
+    start_warm_up()
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8080)
@@ -0,0 +1,206 @@
+"""Prediction client module
+
+Sends scans to the predict.py service over one pooled keep-alive HTTP
+session per service URL, so the Streamlit tier can scale separately from
+the inference tier. Connections are reused across reruns and sessions,
+requests time out, connection failures and 502/503 answers are retried
+with exponential backoff (honouring Retry-After), and when the service
+stays unreachable the scan is scored in-process instead. Read timeouts are
+not retried, since the service may still be running the request, and a
+503 or 504 from a service shedding load is not redone in-process.
+"""
+
+import io
+import os
+import threading
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import preprocessing
+
+
+CONNECT_TIMEOUT = float(os.getenv('PREDICT_CONNECT_TIMEOUT', '3'))
+READ_TIMEOUT = float(os.getenv('PREDICT_READ_TIMEOUT', '30'))
+RETRIES = int(os.getenv('PREDICT_RETRIES', '3'))
+BACKOFF_FACTOR = float(os.getenv('PREDICT_BACKOFF_FACTOR', '0.3'))
+POOL_SIZE = int(os.getenv('PREDICT_POOL_SIZE', '10'))
+FALLBACK = os.getenv('PREDICT_FALLBACK', '1') == '1'
+PREDICT_URL = '/predict'
+PREDICT_BATCH_URL = '/predict/batch'
+RISK_BATCH_URL = '/risk/batch'
+NPY_MIMETYPE = 'application/x-npy'
+THUMBNAIL_SIZE = (256, 256)
+# Mirror predict.py without importing the server module
+DEADLINE_HEADER = 'X-Request-Deadline-Ms'
+THRESHOLD = 0.5
+# Answers of a service shedding load, whose work must not be redone in-process
+LOAD_SHEDDING_STATUSES = (503, 504)
+
+
+def decode_scan(file):
+    """Decodes a scan once into a preview thumbnail and the model's uint8 input"""
+    img = preprocessing.open_image(file)
+    pixels = np.asarray(preprocessing.resize_image(img))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.thumbnail(THUMBNAIL_SIZE)
+    return img, pixels
+
+
+class PredictClient:
+    """Keep-alive HTTP client for the prediction service"""
+
+    def __init__(self, base_url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=RETRIES,
+                 backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE, fallback=FALLBACK):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.fallback = fallback
+        retry = Retry(
+            total=retries,
+            # Posts are not idempotent: a read timeout may mean the inference is still running
+            read=0,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503),
+            allowed_methods=None,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def falls_back(self, error):
+        """Tells whether a failed request is scored in-process instead"""
+        response = getattr(error, 'response', None)
+        shed = response is not None and response.status_code in LOAD_SHEDDING_STATUSES
+        return self.fallback and not shed
+
+    def predict_remote(self, file):
+        """Posts one scan to the service and returns whether it shows a stroke"""
+        file.seek(0)
+        response = self.session.post(
+            self.base_url + PREDICT_URL,
+            files={'img': (getattr(file, 'name', 'scan.png'), file.read())},
+            # The server drops the request once this client would have timed out
+            headers={DEADLINE_HEADER: str(int(self.timeout[1] * 1000))},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        body = response.json()
+        if 'Error' in body:
+            raise RuntimeError(body['Error'])
+        return body['stroke']
+
+    def predict_proba_pixels_remote(self, pixels):
+        """Posts pre-sized uint8 images as one .npy batch and returns their probabilities"""
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(pixels, dtype=np.uint8))
+        response = self.session.post(
+            self.base_url + PREDICT_BATCH_URL,
+            data=buffer.getvalue(),
+            headers={
+                'Content-Type': NPY_MIMETYPE,
+                'Accept': 'application/json',
+                DEADLINE_HEADER: str(int(self.timeout[1] * 1000)),
+            },
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        body = response.json()
+        if 'Error' in body:
+            raise RuntimeError(body['Error'])
+        return body['probabilities']
+
+    def predict_proba_pixels(self, pixels):
+        """Scores pre-sized images remotely, falling back to in-process when the service is down"""
+        try:
+            return self.predict_proba_pixels_remote(pixels)
+        except requests.RequestException as e:
+            if not self.falls_back(e):
+                raise
+            print(f'Prediction service unavailable ({e}), predicting in-process')
+        import predict
+
+        return predict.predict_proba_pixels(np.asarray(pixels, dtype=np.uint8))
+
+    def predict_risk_batch_remote(self, rows):
+        """Posts tabular feature rows to the service and returns their probabilities"""
+        response = self.session.post(
+            self.base_url + RISK_BATCH_URL,
+            json={'rows': rows},
+            headers={DEADLINE_HEADER: str(int(self.timeout[1] * 1000))},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        body = response.json()
+        if 'Error' in body:
+            raise RuntimeError(body['Error'])
+        return body['probabilities']
+
+    def predict_risk_batch(self, rows):
+        """Scores feature rows remotely, falling back to in-process when the service is down"""
+        try:
+            return self.predict_risk_batch_remote(rows)
+        except requests.RequestException as e:
+            if not self.falls_back(e):
+                raise
+            print(f'Prediction service unavailable ({e}), predicting in-process')
+        import risk_model
+
+        return risk_model.predict_risk_batch(rows)
+
+    def predict(self, file):
+        """Scores a scan remotely, falling back to in-process when the service is down"""
+        try:
+            return self.predict_remote(file)
+        except requests.RequestException as e:
+            if not self.falls_back(e):
+                raise
+            print(f'Prediction service unavailable ({e}), predicting in-process')
+        import predict
+
+        file.seek(0)
+        return predict.predict(file)
+
+
+clients = {}
+clients_lock = threading.Lock()
+
+
+def get_client(base_url):
+    """Returns the shared client of a service URL, created on first use"""
+    with clients_lock:
+        if base_url not in clients:
+            clients[base_url] = PredictClient(base_url)
+        return clients[base_url]
+
+
+def predict(file, base_url=None):
+    """Scores a scan through the service at base_url, or in-process without one"""
+    if base_url:
+        return get_client(base_url).predict(file)
+    import predict as local_predict
+
+    return local_predict.predict(file)
+
+
+def predict_proba_pixels(pixels, base_url=None):
+    """Scores pre-sized uint8 images through the service at base_url, or in-process"""
+    if base_url:
+        return get_client(base_url).predict_proba_pixels(pixels)
+    import predict as local_predict
+
+    return local_predict.predict_proba_pixels(np.asarray(pixels, dtype=np.uint8))
+
+
+def predict_risk_batch(rows, base_url=None):
+    """Scores tabular feature rows through the service at base_url, or in-process"""
+    if base_url:
+        return get_client(base_url).predict_risk_batch(rows)
+    import risk_model
+
+    return risk_model.predict_risk_batch(rows)
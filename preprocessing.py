@@ -0,0 +1,58 @@
+"""Preprocessing module
+
+Turns scans into model input in one place, so the prediction service, the
+client's in-process fallback, bulk scoring and model calibration all feed
+the model the same pixels for the same scan. Images are decoded straight
+at the model's size when the format allows it (JPEG draft mode), resized
+with nearest-neighbour sampling, and their uint8 pixels mapped to model
+input values through a 256-entry lookup table. Only NumPy and Pillow are
+needed, so the Streamlit tier can import it without the server.
+"""
+
+import numpy as np
+from PIL import Image
+
+
+TARGET_SIZE = (224, 224)
+TENSOR_SHAPE = (TARGET_SIZE[1], TARGET_SIZE[0], 3)
+
+
+def open_image(file, target_size=TARGET_SIZE):
+    """Decodes an image, letting JPEG decode at the reduced scale closest to target_size"""
+    img = Image.open(file)
+    img.draft('RGB', target_size)
+    img.load()
+    return img
+
+
+def resize_image(img, target_size=TARGET_SIZE):
+    """Resizes the image to the target value"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.resize(target_size, Image.NEAREST)
+    return img
+
+
+def decode_image(file, target_size=TARGET_SIZE):
+    """Decodes and resizes an image to the model's uint8 RGB input"""
+    return resize_image(open_image(file, target_size), target_size)
+
+
+def quantize(x, dtype, quantization):
+    """Maps [0, 1] float inputs onto a quantized tensor's integer range"""
+    scale, zero_point = quantization
+    info = np.iinfo(dtype)
+    return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(dtype)
+
+
+def pixel_lookup_table(dtype, quantization=None):
+    """Returns the model input value for each of the 256 possible pixel values"""
+    x = np.arange(256, dtype='float32') / np.float32(255)
+    if np.issubdtype(dtype, np.integer):
+        return quantize(x, dtype, quantization)
+    return x.astype(dtype)
+
+
+def preprocess_into(img, out, pixel_lut):
+    """Writes the model input values of an image's pixels into a preallocated buffer"""
+    np.take(pixel_lut, np.asarray(img), out=out)
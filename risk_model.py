@@ -0,0 +1,149 @@
+"""Tabular risk model module
+
+Scores stroke risk from the patient information collected by
+create_feature_input() in app.py: age, gender, hypertension, heart
+disease, average glucose level, BMI and smoking status, encoded the same
+way as that form. The model is a scikit-learn pipeline saved with joblib
+and loaded once per process with its arrays memory-mapped. Rows are
+scored in one predict_proba call per batch, so thousands of intake forms
+cost about as much as one. To train it on the Kaggle stroke prediction
+dataset:
+
+    python risk_model.py healthcare-dataset-stroke-data.csv data/risk_model.joblib
+"""
+
+import argparse
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+RISK_MODEL_PATH = os.getenv('RISK_MODEL_PATH', 'data/risk_model.joblib')
+FEATURES = ['age', 'gender', 'hypertension', 'heart_disease', 'avg_glucose_level', 'bmi', 'smoking_status']
+GENDERS = {'Male': 0, 'Female': 1}
+SMOKING_STATUSES = {'Never Smoked': 0, 'Formerly Smoked': 1, 'Smokes': 2}
+THRESHOLD = 0.5
+
+model = None
+model_lock = threading.Lock()
+
+
+def load_risk_model(path=RISK_MODEL_PATH):
+    """Loads a saved pipeline, memory-mapping its arrays"""
+    import joblib
+
+    return joblib.load(path, mmap_mode='r')
+
+
+def get_risk_model():
+    """Returns the risk model, loaded on first use"""
+    global model
+    if model is not None:
+        return model
+    with model_lock:
+        if model is None:
+            model = load_risk_model()
+    return model
+
+
+def feature_matrix(rows):
+    """Stacks feature rows, given as lists, dicts or a DataFrame, into a float matrix"""
+    if isinstance(rows, pd.DataFrame):
+        X = rows[FEATURES].to_numpy(dtype='float64')
+    else:
+        rows = list(rows)
+        if rows and isinstance(rows[0], dict):
+            rows = [[row[feature] for feature in FEATURES] for row in rows]
+        X = np.asarray(rows, dtype='float64')
+    if X.ndim != 2 or X.shape[1] != len(FEATURES):
+        raise ValueError(f'Expected rows of {len(FEATURES)} features: {", ".join(FEATURES)}')
+    return X
+
+
+def predict_risk_batch(rows, risk_model=None):
+    """Returns the stroke probability of each feature row"""
+    X = feature_matrix(rows)
+    if len(X) == 0:
+        return []
+    return (risk_model or get_risk_model()).predict_proba(X)[:, 1].tolist()
+
+
+def category_codes(values, categories):
+    """Encodes a column of labels, in any case, or of their codes; unknown values become NaN"""
+    labels = {label.lower(): code for label, code in categories.items()}
+    numeric = pd.to_numeric(values, errors='coerce')
+    codes = values.astype(str).str.strip().str.lower().map(labels)
+    return codes.fillna(numeric.where(numeric.isin(list(categories.values())))).astype('float64')
+
+
+def known_categories(df):
+    """Tells which rows have a known gender and smoking status"""
+    return (
+        category_codes(df['gender'], GENDERS).notna()
+        & category_codes(df['smoking_status'], SMOKING_STATUSES).notna()
+    )
+
+
+def encode_category(values, categories, column):
+    """Encodes a categorical column, raising with the offending rows if any value is unknown"""
+    codes = category_codes(values, categories)
+    unknown = codes.index[codes.isna()]
+    if len(unknown):
+        examples = ', '.join(f'{row} ({values[row]!r})' for row in unknown[:5])
+        raise ValueError(
+            f"Unknown {column} in {len(unknown)} rows, e.g. rows {examples}; "
+            f"expected one of {', '.join(categories)} or their codes"
+        )
+    return codes
+
+
+def encode_dataset(df):
+    """Encodes the Kaggle stroke dataset the way create_feature_input() does"""
+    return pd.DataFrame({
+        'age': df['age'],
+        'gender': encode_category(df['gender'], GENDERS, 'gender'),
+        'hypertension': df['hypertension'],
+        'heart_disease': df['heart_disease'],
+        'avg_glucose_level': df['avg_glucose_level'],
+        'bmi': df['bmi'].fillna(df['bmi'].median()),
+        'smoking_status': encode_category(df['smoking_status'], SMOKING_STATUSES, 'smoking_status'),
+    })[FEATURES]
+
+
+def train(df):
+    """Fits a scaled, class-balanced logistic regression on the encoded dataset
+
+    Rows without a known gender and smoking status, such as the dataset's
+    'Other' gender and 'Unknown' smoking status, are left out.
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    known = known_categories(df)
+    if not known.all():
+        print(f'Leaving out {(~known).sum()} rows with an unknown gender or smoking status')
+    df = df[known]
+    pipeline = make_pipeline(StandardScaler(), LogisticRegression(class_weight='balanced', max_iter=1000))
+    return pipeline.fit(encode_dataset(df).to_numpy(dtype='float64'), df['stroke'].to_numpy())
+
+
+def main():
+    """Command line entry point"""
+    import joblib
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('dataset', help='CSV with the Kaggle stroke prediction dataset columns')
+    parser.add_argument('output', nargs='?', default=RISK_MODEL_PATH, help='Saved model path')
+    args = parser.parse_args()
+
+    risk_model = train(pd.read_csv(args.dataset))
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    joblib.dump(risk_model, args.output)
+    print(f'Saved risk model to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Risk scoring module
+
+Vectorized version of the risk factor formula of the Risk Analysis page.
+Scores are computed on whole arrays of patients at once, so a clinic
+roster of 100k rows or a blood pressure x activity sensitivity grid takes
+a handful of NumPy operations instead of a Python loop.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+DIET_LEVELS = ["Poor", "Fair", "Good", "Excellent"]
+DIET_POINTS = np.array([25, 15, 5, 0], dtype='float64')
+DIET_SCORES = dict(zip(DIET_LEVELS, DIET_POINTS.tolist()))
+COHORT_COLUMNS = ["smoking", "blood_pressure", "physical_activity", "diet_quality"]
+HIGH_RISK = 70
+MEDIUM_RISK = 30
+
+
+def diet_points(diet_quality):
+    """Maps diet quality labels to their risk points"""
+    codes = pd.Categorical(np.atleast_1d(diet_quality), categories=DIET_LEVELS).codes
+    if (codes < 0).any():
+        raise ValueError(f"Diet quality must be one of {', '.join(DIET_LEVELS)}")
+    return DIET_POINTS[codes].reshape(np.shape(diet_quality))
+
+
+def risk_scores(smoking, blood_pressure, physical_activity, diet_quality):
+    """Returns the risk score of each patient; arguments broadcast against each other"""
+    smoking = np.asarray(smoking, dtype='float64')
+    blood_pressure = np.asarray(blood_pressure, dtype='float64')
+    physical_activity = np.asarray(physical_activity, dtype='float64')
+    return (smoking / 3.0 * 25) + \
+        ((blood_pressure - 90) / 110 * 25) + \
+        ((20 - physical_activity) / 20 * 25) + \
+        diet_points(diet_quality)
+
+
+def risk_levels(scores):
+    """Returns the High, Medium or Low label of each score"""
+    return np.where(scores > HIGH_RISK, "High", np.where(scores > MEDIUM_RISK, "Medium", "Low"))
+
+
+def read_cohort(file):
+    """Reads a roster CSV with one patient per row and the risk factor columns"""
+    df = pd.read_csv(
+        file,
+        dtype={
+            "smoking": "float64",
+            "blood_pressure": "float64",
+            "physical_activity": "float64",
+            "diet_quality": "category",
+        },
+    )
+    missing = [column for column in COHORT_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    # A missing value would score NaN, which no threshold labels High
+    gaps = df[COHORT_COLUMNS].isna()
+    incomplete = df.index[gaps.any(axis=1)]
+    if len(incomplete):
+        examples = ', '.join(
+            f"{row} ({', '.join(gaps.columns[gaps.loc[row]])})" for row in incomplete[:5]
+        )
+        raise ValueError(f"Missing risk factors in {len(incomplete)} rows, e.g. rows {examples}")
+    return df
+
+
+def score_cohort(df):
+    """Adds risk_score and risk_level columns to a roster"""
+    scores = risk_scores(
+        df["smoking"].to_numpy(),
+        df["blood_pressure"].to_numpy(),
+        df["physical_activity"].to_numpy(),
+        df["diet_quality"].to_numpy(),
+    )
+    return df.assign(risk_score=scores, risk_level=risk_levels(scores))
+
+
+def sensitivity_grid(blood_pressures, physical_activities, smoking, diet_quality):
+    """Scores every blood pressure x activity pair in one broadcast
+
+    Rows follow blood_pressures and columns physical_activities, with
+    smoking and diet quality held fixed.
+    """
+    blood_pressures = np.asarray(blood_pressures, dtype='float64')[:, np.newaxis]
+    physical_activities = np.asarray(physical_activities, dtype='float64')[np.newaxis, :]
+    return risk_scores(smoking, blood_pressures, physical_activities, diet_quality)
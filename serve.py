@@ -0,0 +1,17 @@
+"""Streamlit server module
+
+Runs app.py as an ASGI app whose content-hashed assets, the app
+stylesheet and the component bundles built by static_assets.py, are
+cached by browsers for a year instead of being revalidated on every page
+load:
+
+    streamlit run serve.py
+"""
+
+import streamlit as st
+from starlette.middleware import Middleware
+
+from static_assets import CacheHashedAssets
+
+
+app = st.App('app.py', middleware=[Middleware(CacheHashedAssets)])
@@ -0,0 +1,134 @@
+"""Static assets module
+
+Builds the app stylesheet and the movement analysis component from
+frontend/ into static/, with the content hash of each CSS and JS file in
+its name, so a changed file gets a new URL and an unchanged one can stay
+in the browser cache. Reruns then send a one-line @import of the
+stylesheet and the component's arguments instead of the whole CSS and
+HTML. Streamlit serves static/ under app/static (see .streamlit/config.toml),
+and serve.py runs the app with long-lived Cache-Control headers on the
+hashed files. Assets are built on first use, or ahead of time with:
+
+    python static_assets.py
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FRONTEND_DIR = os.path.join(ROOT, 'frontend')
+STATIC_DIR = os.path.join(ROOT, 'static')
+STATIC_URL = 'app/static'
+STYLESHEET = 'app.css'
+COMPONENTS = ['movement_analysis']
+HASH_LENGTH = 12
+HASHED_ASSET = re.compile(rf'\.[0-9a-f]{{{HASH_LENGTH}}}\.(?:css|js)$')
+ASSET_MAX_AGE = int(os.getenv('ASSET_MAX_AGE', str(365 * 24 * 3600)))
+
+manifest = None
+manifest_lock = threading.Lock()
+
+
+def content_hash(data):
+    """Returns the short content hash put in asset names"""
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def write_file(path, data):
+    """Writes a file atomically, so it is never served half written"""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_hashed(source, target_dir):
+    """Copies a file into target_dir under its content-hashed name and returns that name"""
+    with open(source, 'rb') as f:
+        data = f.read()
+    stem, ext = os.path.splitext(os.path.basename(source))
+    name = f'{stem}.{content_hash(data)}{ext}'
+    path = os.path.join(target_dir, name)
+    if not os.path.exists(path):
+        write_file(path, data)
+    return name
+
+
+def build_component(name):
+    """Builds a component directory whose index.html links its hashed CSS and JS"""
+    source_dir = os.path.join(FRONTEND_DIR, name)
+    target_dir = os.path.join(STATIC_DIR, name)
+    os.makedirs(target_dir, exist_ok=True)
+    with open(os.path.join(source_dir, 'index.html')) as f:
+        html = f.read()
+    for filename in sorted(os.listdir(source_dir)):
+        if filename.endswith(('.css', '.js')):
+            html = html.replace(f'"{filename}"', f'"{write_hashed(os.path.join(source_dir, filename), target_dir)}"')
+    write_file(os.path.join(target_dir, 'index.html'), html.encode())
+    return target_dir
+
+
+def build():
+    """Builds every asset and returns the manifest of their built names and paths"""
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    built = {STYLESHEET: write_hashed(os.path.join(FRONTEND_DIR, STYLESHEET), STATIC_DIR)}
+    for name in COMPONENTS:
+        built[name] = build_component(name)
+    return built
+
+
+def get_manifest():
+    """Returns the asset manifest, building the assets on first use"""
+    global manifest
+    if manifest is not None:
+        return manifest
+    with manifest_lock:
+        if manifest is None:
+            manifest = build()
+    return manifest
+
+
+def component_path(name):
+    """Returns the built directory of a component, for components.declare_component"""
+    return get_manifest()[name]
+
+
+def stylesheet():
+    """Returns the markdown that imports the hashed app stylesheet"""
+    return f'<style>@import url("{STATIC_URL}/{get_manifest()[STYLESHEET]}");</style>'
+
+
+class CacheHashedAssets:
+    """ASGI middleware serving content-hashed assets with long-lived Cache-Control headers"""
+
+    def __init__(self, app, max_age=ASSET_MAX_AGE):
+        self.app = app
+        self.cache_control = f'public, max-age={max_age}, immutable'.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not HASHED_ASSET.search(scope['path']):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_cached(message):
+            if message['type'] == 'http.response.start' and message['status'] == 200:
+                headers = [(k, v) for k, v in message.get('headers', []) if k.lower() != b'cache-control']
+                message = {**message, 'headers': [*headers, (b'cache-control', self.cache_control)]}
+            await send(message)
+
+        await self.app(scope, receive, send_cached)
+
+
+def main():
+    """Command line entry point"""
+    shutil.rmtree(STATIC_DIR, ignore_errors=True)
+    for name, built in build().items():
+        print(f'{name}: {os.path.relpath(os.path.join(STATIC_DIR, built), ROOT)}')
+
+
+if __name__ == '__main__':
+    main()